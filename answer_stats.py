@@ -0,0 +1,143 @@
+import math
+from array import array
+from collections import Counter
+
+# Per question answer-consensus statistics of an exam, kept column-wise in arrays so an exam
+# with hundreds of questions takes a few kilobytes and filtering or sorting never touches
+# the comments. Question i of the exam is row i of every column; the picks of question i
+# are dist_answer/dist_count[dist_start[i]:dist_start[i + 1]], most common first.
+COLUMNS = {
+    "question_number": "l",  # -1 if the number is not numeric
+    "comments": "l",         # comments and replies
+    "votes": "l",            # comments with a selected answer
+    "most_voted": "l",       # index into answers, -1 if the site reports none
+    "agreement": "d",        # share of the votes for most_voted, nan without votes or most_voted
+    "top_share": "d",        # share of the votes for the most common pick, nan without votes
+    "top_agrees": "b",       # most common pick is most_voted: 1, it is not: 0, unknown: -1
+    "dist_start": "l",
+    "dist_answer": "l",      # index into answers
+    "dist_count": "l",
+}
+# Questions where less than this share of the votes agrees with most_voted have low agreement
+LOW_AGREEMENT = 0.6
+FILTERS = ("all", "disputed", "low_agreement")
+SORTS = ("number", "agreement", "comments", "votes")
+
+def normalize_answer(answer):
+    # "DB" and "BD" are the same pick
+    return "".join(sorted((answer or "").replace(" ", "").upper()))
+
+class AnswerStats:
+    def __init__(self, columns, answers):
+        self.columns = columns
+        self.answers = answers
+
+    @classmethod
+    def compute(cls, questions):
+        columns = {name: array(typecode) for name, typecode in COLUMNS.items()}
+        answers = []
+        answer_ids = {}
+        columns["dist_start"].append(0)
+        for question in questions:
+            number = str(question.get("question_number", ""))
+            comments = question.get("comments", [])
+            picks = Counter()
+            for comment in comments:
+                answer = normalize_answer(comment.get("selected_answer"))
+                if answer:
+                    picks[answer] += 1
+            votes = sum(picks.values())
+            most_voted = normalize_answer(question.get("most_voted"))
+            distribution = picks.most_common()
+
+            columns["question_number"].append(int(number) if number.isdigit() else -1)
+            columns["comments"].append(len(comments) + sum(len(c.get("replies", [])) for c in comments))
+            columns["votes"].append(votes)
+            columns["most_voted"].append(cls._answer_id(most_voted, answers, answer_ids) if most_voted else -1)
+            columns["agreement"].append(picks[most_voted] / votes if votes and most_voted else math.nan)
+            columns["top_share"].append(distribution[0][1] / votes if votes else math.nan)
+            columns["top_agrees"].append(int(distribution[0][0] == most_voted) if votes and most_voted else -1)
+            for answer, count in distribution:
+                columns["dist_answer"].append(cls._answer_id(answer, answers, answer_ids))
+                columns["dist_count"].append(count)
+            columns["dist_start"].append(len(columns["dist_answer"]))
+        return cls(columns, answers)
+
+    @staticmethod
+    def _answer_id(answer, answers, answer_ids):
+        if answer not in answer_ids:
+            answer_ids[answer] = len(answers)
+            answers.append(answer)
+        return answer_ids[answer]
+
+    def dump(self):
+        # (name, typecode, bytes) rows for storing, plus the answers as one string
+        rows = [(name, column.typecode, column.tobytes()) for name, column in self.columns.items()]
+        rows.append(("answers", "", "\n".join(self.answers).encode("utf-8")))
+        return rows
+
+    @classmethod
+    def load(cls, rows):
+        columns = {}
+        answers = []
+        for name, typecode, data in rows:
+            if name == "answers":
+                answers = data.decode("utf-8").split("\n") if data else []
+                continue
+            column = array(typecode)
+            column.frombytes(data)
+            columns[name] = column
+        return cls(columns, answers)
+
+    def __len__(self):
+        return len(self.columns["question_number"])
+
+    def distribution(self, i):
+        start, end = self.columns["dist_start"][i], self.columns["dist_start"][i + 1]
+        return [(self.answers[a], c) for a, c in zip(self.columns["dist_answer"][start:end], self.columns["dist_count"][start:end])]
+
+    def row(self, i):
+        row = {name: self.columns[name][i] for name in ("question_number", "comments", "votes", "agreement", "top_share", "top_agrees")}
+        most_voted = self.columns["most_voted"][i]
+        row["most_voted"] = self.answers[most_voted] if most_voted >= 0 else None
+        return row
+
+    def find(self, question_number):
+        question_number = str(question_number)
+        if not question_number.isdigit():
+            return None
+        try:
+            return self.columns["question_number"].index(int(question_number))
+        except ValueError:
+            return None
+
+    def is_disputed(self, i):
+        # The community's most common pick is not the most voted answer
+        return self.columns["top_agrees"][i] == 0
+
+    def is_low_agreement(self, i):
+        agreement = self.columns["agreement"][i]
+        return not math.isnan(agreement) and agreement < LOW_AGREEMENT
+
+    def select(self, filter="all", sort="number", min_votes=0):
+        # Row indexes matching filter, in the order given by sort. Questions without
+        # votes sort last by agreement; comments and votes sort from the largest.
+        if filter not in FILTERS:
+            raise ValueError(f"Unknown filter {filter}. Available: {', '.join(FILTERS)}")
+        if sort not in SORTS:
+            raise ValueError(f"Unknown sort {sort}. Available: {', '.join(SORTS)}")
+        votes = self.columns["votes"]
+        rows = [i for i in range(len(self)) if votes[i] >= min_votes]
+        if filter == "disputed":
+            rows = [i for i in rows if self.is_disputed(i)]
+        elif filter == "low_agreement":
+            rows = [i for i in rows if self.is_low_agreement(i)]
+        if sort == "number":
+            rows.sort(key=self.columns["question_number"].__getitem__)
+        elif sort == "agreement":
+            agreement = self.columns["agreement"]
+            rows.sort(key=lambda i: (1, 0) if math.isnan(agreement[i]) else (0, agreement[i]))
+        else:
+            column = self.columns[sort]
+            rows.sort(key=lambda i: -column[i])
+        return rows
@@ -1,52 +1,114 @@
 import streamlit as st
+import glob
 import os
-import json
-import random
 from streamlit_modal import Modal
 import streamlit.components.v1 as components
-from scraper import get_question_links, scrape_questions, load_json_from_github
-from pdf import generate_pdf
+from scraper import load_json_from_github
+import jobs
+from pdf import parse_question_numbers
+from pdf_cache import get_pdf
+from exam_store import open_exam, write_exam, search_exams, ExamStore
+from question_store import QuestionStore
 from ui_utils import render_question_header, render_question_body, render_answers, render_discussion, render_highlight_toggle
+from ui_utils import CONSENSUS_FILTERS, CONSENSUS_SORTS, consensus_table, render_consensus_summary
 
 if os.environ.get("HOSTNAME"):
     IS_DEPLOYED = os.environ["HOSTNAME"] == "streamlit"
 else:
     IS_DEPLOYED = False
 
-def get_exam_questions(exam_code, progress, rapid_scraping=False):
+# Exams are cached once per process and shared read-only by all sessions;
+# a session only keeps the number of the question it shows
+EXAM_CACHE_ENTRIES = 8
+GITHUB_STORE_DIR = os.path.join(".cache", "exams")
+# PDF exports of at least this many questions are rendered in PDF_PROCESSES processes,
+# smaller ones in the app's own process
+PARALLEL_PDF_QUESTIONS = 300
+PDF_PROCESSES = min(2, os.cpu_count() or 1)
+
+@st.cache_resource(max_entries=EXAM_CACHE_ENTRIES, show_spinner=False)
+def load_local_exam(questions_path, mtime):
+    # mtime is part of the cache key, so a rewritten file is loaded again
+    return QuestionStore(exam_store=open_exam(questions_path))
+
+@st.cache_resource(max_entries=EXAM_CACHE_ENTRIES, ttl=3600, show_spinner=False)
+def load_github_exam(exam_code):
+    questions, err = load_json_from_github(exam_code)
+    if not questions:
+        raise ValueError(err)  # errors are not cached, the next load tries again
+    # Stored like a local exam, which also builds its search index
+    os.makedirs(GITHUB_STORE_DIR, exist_ok=True)
+    db_path = os.path.join(GITHUB_STORE_DIR, f"{exam_code}.db")
+    write_exam({"status": "complete", "questions": questions}, db_path)
+    return QuestionStore(exam_store=ExamStore(db_path))
+
+def open_exam_store(exam_code):
     if IS_DEPLOYED:
-        questions, err = load_json_from_github(exam_code)
-        if questions:
-            progress.progress(100, text=f"Loaded from GitHub")
-            return questions, ""
-        else:
-            return [], err
+        try:
+            return load_github_exam(exam_code)
+        except ValueError:
+            return QuestionStore()
+    questions_path = f"data/{exam_code}.json"
+    if not os.path.exists(questions_path):
+        return QuestionStore()
+    return load_local_exam(questions_path, os.path.getmtime(questions_path))
+
+def get_exam_questions(exam_code, progress, rapid_scraping=False, refresh=False):
+    if IS_DEPLOYED:
+        try:
+            questions = load_github_exam(exam_code)
+        except ValueError as e:
+            return QuestionStore(), str(e)
+        progress.progress(100, text=f"Loaded from GitHub")
+        return questions, ""
     else:
         questions_path = f"data/{exam_code}.json"
-        links_path = f"data/{exam_code}_links.json"
-        if os.path.exists(questions_path):
-            with open(questions_path, "r", encoding="utf-8") as f:
-                questions_JSON = json.load(f)
-                if questions_JSON.get("status") == "complete":
-                    progress.progress(100, text=f"Extracted questions from file")
-                    return (questions_JSON.get("questions", []), "")
-        try:        
-            links = get_question_links(exam_code, progress, links_path)
-        except Exception as e:
-            return [], e
-        
-        if len(links) == 0:
-            return [], "No questions found. Please check the exam code and try again."
-        questions_obj = scrape_questions(links, questions_path, progress, rapid_scraping)
-        questions = questions_obj.get("questions", [])
-        if questions_obj.get("error","") != "":
-            return (questions, f"Error occurred while scraping questions. Your connection may be slow or the website may have limited your rate. You can still see {len(questions)} questions. Try again later by refreshing the page.")
-        return (questions, "")
+        if not refresh and os.path.exists(questions_path):
+            questions = open_exam_store(exam_code)
+            if questions.exam_store.status == "complete":
+                progress.progress(100, text=f"Extracted questions from file")
+                return (questions, "")
+        # Scraping runs in the background worker, so it goes on when this tab is closed
+        # and a later session picks up the same job
+        job = jobs.enqueue(exam_code, rapid_scraping=rapid_scraping, refresh=refresh)
+        # A scrape of the exam that was already queued or running is not a refresh
+        refresh_dropped = refresh and not job["refresh"]
+        jobs.start_worker()
+        job = jobs.wait(exam_code, progress)
+        if job is None:
+            return (open_exam_store(exam_code), f"The scrape job of {exam_code} could not be read. Please try again.")
+        error = job["error"]
+        if refresh_dropped and not error:
+            error = f"{exam_code} was already being scraped, so it was not checked for new questions. Check again now that the scrape has finished."
+        return (open_exam_store(exam_code), error)
     
 def clear_text():
     st.session_state.input = st.session_state.question_number_input_text
     st.session_state.question_number_input_text = ""
 
+def search_questions(questions, exam_code, query):
+    # Returns (exam_code, question_number, snippet) of the best matches
+    if st.session_state.get("search_all_exams") and not IS_DEPLOYED:
+        paths = [p for p in glob.glob(os.path.join("data", "*.json")) if not p.endswith("_links.json")]
+        results = search_exams(query, paths)
+        return [(code, number, snippet) for code, number, _, snippet in results]
+    return [(exam_code, number, snippet) for number, _, snippet in questions.search(query)]
+
+def open_consensus_row():
+    selected_rows = st.session_state.consensus_table.selection.rows
+    if selected_rows:
+        st.session_state.question_number = str(st.session_state.consensus_numbers[selected_rows[0]])
+        st.session_state.highlight = False
+
+def open_search_result(result_exam_code, question_number):
+    st.session_state.highlight = False
+    if result_exam_code == st.session_state.get("loaded_exam_code"):
+        st.session_state.question_number = question_number
+    else:
+        # Loads the other exam on the rerun and then shows the question
+        st.session_state.exam_code_input = result_exam_code
+        st.session_state.jump_question = question_number
+
 st.set_page_config(page_title="ExamTopics Viewer", layout="wide")
 
 css_style = """
@@ -62,20 +124,25 @@ st.markdown(css_style, unsafe_allow_html=True)
 st.session_state["rapid_scraping"] = st.session_state.get("rapid_scraping", False)
 st.session_state["show_discussion"] = st.session_state.get("show_discussion", True)
 st.session_state["default_highlight"] = st.session_state.get("default_highlight", False)
+st.session_state["pdf_questions"] = st.session_state.get("pdf_questions", "")
+st.session_state["pdf_discussion"] = st.session_state.get("pdf_discussion", True)
+st.session_state["pdf_max_comments"] = st.session_state.get("pdf_max_comments", 0)
+st.session_state["pdf_most_voted_only"] = st.session_state.get("pdf_most_voted_only", False)
+st.session_state["search_all_exams"] = st.session_state.get("search_all_exams", False)
 
 st.title("ExamTopics Question Viewer")
 
 top_col1, top_options_btn_col, top_col2 = st.columns((15,1,4))
 code_col, options_btn_col = st.columns((15, 1))
 
-if "questions" not in st.session_state:
+if "loaded_exam_code" not in st.session_state:
     with code_col:
-        exam_code = st.text_input("Enter Exam Code (e.g., CAD):", placeholder="Enter Exam Code (e.g., CAD):", label_visibility="collapsed")
+        exam_code = st.text_input("Enter Exam Code (e.g., CAD):", key="exam_code_input", placeholder="Enter Exam Code (e.g., CAD):", label_visibility="collapsed")
     with options_btn_col:
         open_modal = st.button("⚙️", key="gear_button", help="Open Settings")
 else:
     with top_col1:
-        exam_code = st.text_input("Enter Exam Code (e.g., CAD):", placeholder="Enter Exam Code (e.g., CAD):", label_visibility="collapsed")
+        exam_code = st.text_input("Enter Exam Code (e.g., CAD):", key="exam_code_input", placeholder="Enter Exam Code (e.g., CAD):", label_visibility="collapsed")
     with top_options_btn_col:
         open_modal = st.button("⚙️", key="gear_button", help="Open Settings")
 
@@ -113,37 +180,79 @@ if modal.is_open():
         if default_highlight:
             st.session_state["highlight"] = True
 
+        st.markdown("""
+        <hr style='margin-top:10px;margin-bottom:10px'/>
+        """, unsafe_allow_html=True)
+
+        st.markdown("### 📄 PDF Export")
+
+        st.text_input("Questions to export", value=st.session_state.get("pdf_questions", ""), key="pdf_questions_input", placeholder="All questions (e.g. 1-50, 75)")
+        pdf_discussion = st.toggle("Include discussion", value=st.session_state.get("pdf_discussion", True))
+        pdf_max_comments = st.number_input("Maximum comments per question (0 = all)", min_value=0, value=st.session_state.get("pdf_max_comments", 0), step=1)
+        pdf_most_voted_only = st.toggle("Only include the most voted answer", value=st.session_state.get("pdf_most_voted_only", False))
+        st.session_state["pdf_questions"] = st.session_state["pdf_questions_input"]
+        st.session_state["pdf_discussion"] = pdf_discussion
+        st.session_state["pdf_max_comments"] = pdf_max_comments
+        st.session_state["pdf_most_voted_only"] = pdf_most_voted_only
+
+        if not IS_DEPLOYED:
+            search_all_exams = st.toggle("Search all exams", value=st.session_state.get("search_all_exams", False), help="Text searches look through every exam in data/, not only the open one")
+            st.session_state["search_all_exams"] = search_all_exams
+
+        if not IS_DEPLOYED and st.session_state.get("loaded_exam_code"):
+            if st.button("Check for new questions", help="Fetch only new questions and discussions that changed since the last scrape"):
+                st.session_state["refresh_exam"] = True
+                st.session_state.pop("loaded_exam_code", None)
+                modal.close()
+
 if exam_code:
     if "loaded_exam_code" not in st.session_state or st.session_state.loaded_exam_code != exam_code:
         with st.spinner("Fetching questions..."):
             progress = st.progress(0, text="Starting questions extraction...")
-            questions, err = get_exam_questions(exam_code, progress, rapid_scraping=st.session_state["rapid_scraping"])
+            refresh = st.session_state.pop("refresh_exam", False)
+            questions, err = get_exam_questions(exam_code, progress, rapid_scraping=st.session_state["rapid_scraping"], refresh=refresh)
             st.session_state.error = err
-            st.session_state.questions = questions
+            st.session_state.question_count = len(questions)
             st.session_state.loaded_exam_code = exam_code
             st.session_state.just_loaded = True
-            if len(questions) > 0:
-                selected_question = questions[0]
-                st.session_state.question = selected_question
+            jump_question = st.session_state.pop("jump_question", None)
+            if jump_question and questions.get(jump_question):
+                st.session_state.question_number = jump_question
+            elif len(questions) > 0:
+                st.session_state.question_number = questions.first()["question_number"]
+            else:
+                st.session_state.pop("question_number", None)
             if len(questions) == 0:
                 st.warning("No questions found.")
             st.rerun()
     else:
-        questions = st.session_state.questions
+        questions = open_exam_store(exam_code)
     with top_col2:
         export_button = st.button("Export Questions to PDF", use_container_width=True)
     if export_button:
         progress_pdf = st.progress(0, text="Starting PDF generation...")
-        questions = st.session_state["questions"]
         try:
-            pdf_data = generate_pdf(questions, progress_pdf)
+            pdf_options = {
+                "question_numbers": parse_question_numbers(st.session_state["pdf_questions"]) or None,
+                "include_discussion": st.session_state["pdf_discussion"],
+                "max_comments": st.session_state["pdf_max_comments"] or None,
+                "most_voted_only": st.session_state["pdf_most_voted_only"],
+            }
+            count = min(len(questions), len(pdf_options["question_numbers"] or questions))
+            processes = PDF_PROCESSES if count >= PARALLEL_PDF_QUESTIONS else None
+            pdf_path, missing_images = get_pdf(questions.all(), progress_pdf, processes=processes, options=pdf_options)
             st.success("PDF generation complete.")
-            st.download_button(
-                label="Download PDF",
-                data=pdf_data,
-                file_name=f"{exam_code}_questions.pdf",
-                mime="application/pdf"
-            )
+            if missing_images:
+                st.warning(f"{len(missing_images)} images could not be loaded and are missing from the PDF. Export again to retry them.")
+            with open(pdf_path, "rb") as pdf_file:
+                st.download_button(
+                    label="Download PDF",
+                    data=pdf_file,
+                    file_name=f"{exam_code}_questions.pdf",
+                    mime="application/pdf"
+                )
+        except ValueError as e:
+            st.error(f"❌ {e}")
         except Exception as e:
             st.error(f"❌ Failed to generate PDF. Reason: {str(e)}. It may be due to a connection issue. Please try again.")
 
@@ -151,17 +260,17 @@ if exam_code:
         if st.session_state.get("error", "") != "":
             st.error(st.session_state.get("error", ""))
         else:
-            st.success(f"Loaded {len(st.session_state.questions)} questions.")
+            st.success(f"Loaded {st.session_state.question_count} questions.")
         st.session_state.just_loaded = False
 
-    if st.session_state.get("question"):
-        selected_question = st.session_state.get("question")
+    if st.session_state.get("question_number"):
+        selected_question = questions.get(st.session_state.question_number)
     else:
         selected_question = None
 
     col1, col2, col3, col4 = st.columns((4,1,1,1))
     with col1:
-        question_number_input = st.text_input("Search question", key="question_number_input_text", on_change=clear_text, placeholder="Search question number", label_visibility="collapsed")
+        question_number_input = st.text_input("Search question", key="question_number_input_text", on_change=clear_text, placeholder="Search question number or text", label_visibility="collapsed")
     with col2:
         previous_button = st.button("Previous Question", use_container_width=True)
     with col3:
@@ -171,52 +280,70 @@ if exam_code:
         
 
     if random_button and questions:
-        selected_question = random.choice(questions)
+        selected_question = questions.random()
         st.session_state.highlight = False
     elif next_button:
-        matching_questions = [q for q in questions if q.get("question_number") == str(int(selected_question["question_number"]) + 1)]
-        if matching_questions:
-            selected_question = matching_questions[0]
-            st.session_state.highlight = False
-        else:
-            question_number = int(selected_question["question_number"])
-            while question_number <= max(int(q["question_number"]) for q in questions):
-                print(question_number)
-                question_number += 1
-                matching_questions = [q for q in questions if q.get("question_number") == str(question_number)]
-                if matching_questions:
-                    selected_question = matching_questions[0]
-                    break
-            st.session_state.highlight = False
+        next_question = questions.next(selected_question["question_number"])
+        if next_question:
+            selected_question = next_question
+        st.session_state.highlight = False
     elif previous_button:
-        matching_questions = [q for q in questions if q.get("question_number") == str(int(selected_question["question_number"]) - 1)]
-        if matching_questions:
-            selected_question = matching_questions[0]
-            st.session_state.highlight = False
-        else:
-            question_number = int(selected_question["question_number"])
-            while question_number > 0 and question_number - 1 >= 0:
-                question_number -= 1
-                matching_questions = [q for q in questions if q.get("question_number") == str(question_number)]
-                if matching_questions:
-                    selected_question = matching_questions[0]
-                    break
-            st.session_state.highlight = False
+        previous_question = questions.previous(selected_question["question_number"])
+        if previous_question:
+            selected_question = previous_question
+        st.session_state.highlight = False
+    elif st.session_state.get("input", "").strip() and not st.session_state.get("input").strip().isdigit():
+        query = st.session_state.input
+        st.session_state.input = ""
+        st.session_state.search_query = query
+        st.session_state.search_results = search_questions(questions, exam_code, query)
     elif st.session_state.get("input", "") != "":
-        matching_questions = [q for q in questions if q.get("question_number") == st.session_state.get("input")]
-        if matching_questions:
-            selected_question = matching_questions[0]
+        matching_question = questions.get(st.session_state.get("input"))
+        if matching_question:
+            selected_question = matching_question
             question_number_input = "test"
             st.session_state.highlight = False
             st.session_state.input = ""
         else:
             st.warning("No question found with that number.")
 
+    with st.expander("📊 Answer consensus"):
+        stats = questions.answer_stats()
+        filter_col, sort_col = st.columns(2)
+        with filter_col:
+            consensus_filter = st.selectbox("Show", list(CONSENSUS_FILTERS), format_func=CONSENSUS_FILTERS.get, key="consensus_filter")
+        with sort_col:
+            consensus_sort = st.selectbox("Sort by", list(CONSENSUS_SORTS), format_func=CONSENSUS_SORTS.get, key="consensus_sort")
+        table = consensus_table(stats, stats.select(consensus_filter, consensus_sort))
+        st.session_state.consensus_numbers = table["Question"]
+        st.caption(f"{len(table['Question'])} questions · select a row to open the question")
+        st.dataframe(
+            table,
+            key="consensus_table",
+            on_select=open_consensus_row,
+            selection_mode="single-row",
+            hide_index=True,
+            use_container_width=True,
+            column_config={"Agreement": st.column_config.NumberColumn(format="%d%%")},
+        )
+
+    if st.session_state.get("search_results") is not None:
+        results = st.session_state.search_results
+        with st.expander(f"{len(results)} results for “{st.session_state.search_query}”", expanded=True):
+            if not results:
+                st.write("No questions match the search.")
+            for i, (result_exam_code, number, snippet) in enumerate(results):
+                label = f"{result_exam_code} – Question {number}: {' '.join(snippet.split())}"
+                st.button(label, key=f"search_result_{i}", on_click=open_search_result, args=(result_exam_code, number), use_container_width=True)
+            if st.button("Close results"):
+                st.session_state.search_results = None
+                st.rerun()
+
     if not st.session_state.get("highlight"):
         st.session_state.highlight = False
     
     if selected_question:
-        st.session_state.question = selected_question
+        st.session_state.question_number = selected_question["question_number"]
         render_question_header(selected_question)
 
         render_question_body(selected_question, "https://www.examtopics.com")
@@ -229,5 +356,7 @@ if exam_code:
         if st.session_state.get("show_discussion"):
             st.markdown("---")
             st.markdown("### Discussion:")
-            render_discussion(selected_question.get("comments", []))
+            render_consensus_summary(questions.answer_stats(), selected_question["question_number"])
+            comments = selected_question.get("comments", [])
+            render_discussion(comments, cache_key=(exam_code, selected_question.get("link")))
 
@@ -0,0 +1,192 @@
+# Offline benchmark and regression check for the discussion page parser.
+#
+#   python benchmarks/parser_benchmark.py [--exam CSA] [--backend lxml] [--processes 4] [--serve]
+#
+# Pages come from the page archive (--archive), or from a corpus directory of saved discussion
+# pages (a links.json file mapping file names to discussion links, next to the .html files).
+# Without either, pages are rendered from the questions in data/<exam>.json, so the default
+# corpus is synthetic and only checks the parser against markup of the benchmark's own making. Every parsed question is compared with
+# the golden question in data/<exam>.json and the script exits with 1 on any mismatch.
+import argparse
+import glob
+import html
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import page_archive  # noqa: E402
+import page_parser  # noqa: E402
+
+DATA_DIR = os.path.join(ROOT, "data")
+
+def render_page(question):
+    # Rebuilds a discussion page with the markup the parser looks for
+    choices = "".join(
+        f'<li class="multi-choice-item">\n  <span class="multi-choice-letter">{html.escape(a[:2])}</span>\n  {html.escape(a[2:])}\n</li>'
+        for a in question["answers"]
+    )
+    tally = ""
+    if question.get("most_voted"):
+        voted_json = json.dumps([{"voted_answers": question["most_voted"], "vote_count": 1, "is_most_voted": True}])
+        tally = f'<div class="voted-answers-tally d-none"><script type="application/json">{voted_json}</script></div>'
+    comments = ""
+    for comment in question["comments"]:
+        selected = ""
+        if comment["selected_answer"]:
+            selected = f'<div class="comment-selected-answers">Selected Answer: <span>{html.escape(comment["selected_answer"])}</span></div>'
+        replies = "".join(
+            f'<div class="comment-container"><div class="comment-content">{html.escape(reply)}</div></div>'
+            for reply in comment["replies"]
+        )
+        comments += (
+            f'<div class="comment-container"><div class="comment-head">user</div>{selected}'
+            f'<div class="comment-content">{html.escape(comment["content"])}</div>'
+            f'<div class="comment-replies">{replies}</div></div>'
+        )
+    return (
+        '<!DOCTYPE html><html><head><title>Discussion</title><script>var tag = "<div>";</script></head>'
+        '<body><nav><ul><li>Home</li><li>Exams</li></ul></nav>'
+        f'<div class="card-body question-body"><p class="card-text">{question["question"]}</p>'
+        f'<div class="question-choices-container"><ul>{choices}</ul></div></div>'
+        f'{tally}<div class="discussion-container">{comments}</div><footer>Footer</footer></body></html>'
+    ).encode("utf-8")
+
+def exam_codes():
+    paths = glob.glob(os.path.join(DATA_DIR, "*.json"))
+    return sorted(os.path.basename(p)[:-5] for p in paths if not p.endswith("_links.json"))
+
+def load_golden(exams):
+    golden = {}
+    for exam in exams:
+        with open(os.path.join(DATA_DIR, f"{exam}.json"), "r", encoding="utf-8") as f:
+            for question in json.load(f).get("questions", []):
+                golden[question["link"]] = question
+    return golden
+
+def load_pages(golden, corpus_dir=None, archive_dir=None):
+    if archive_dir:
+        index = page_archive.load_index(archive_dir)
+        return [(page_archive.read(index[link], archive_dir), link) for link in golden if link in index]
+    if not corpus_dir:
+        return [(render_page(question), link) for link, question in golden.items()]
+    with open(os.path.join(corpus_dir, "links.json"), "r", encoding="utf-8") as f:
+        links = json.load(f)
+    pages = []
+    for file_name, link in links.items():
+        if link in golden:
+            with open(os.path.join(corpus_dir, file_name), "rb") as f:
+                pages.append((f.read(), link))
+    return pages
+
+def serve_pages(pages):
+    # Local stand-in for examtopics.com, so the whole fetch path can be measured offline
+    by_path = {urlparse(link).path: content for content, link in pages}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            content = by_path.get(self.path)
+            self.send_response(200 if content else 404)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(content or b"")))
+            self.end_headers()
+            self.wfile.write(content or b"")
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, [f"http://127.0.0.1:{server.server_port}{urlparse(link).path}" for _, link in pages]
+
+def time_fields(pages, backend):
+    timings = {"soup": 0.0}
+    timings.update({field: 0.0 for field in page_parser.EXTRACTORS})
+    for content, _ in pages:
+        start = time.perf_counter()
+        soup = page_parser.make_soup(content, backend)
+        timings["soup"] += time.perf_counter() - start
+        for field, extractor in page_parser.EXTRACTORS.items():
+            start = time.perf_counter()
+            extractor(soup)
+            timings[field] += time.perf_counter() - start
+    return timings
+
+def parse(pages, args):
+    if not args.serve:
+        return page_parser.parse_pages(pages, args.processes, args.backend)
+    from fetcher import FetchEngine
+    from scraper import scrape_page
+    page_parser.configure(args.backend, args.processes)
+    server, urls = serve_pages(pages)
+    engine = FetchEngine(requests_per_second=None, concurrency=args.concurrency)
+    # Pages of the local server are kept out of the page archive
+    results_by_url = dict(engine.map(partial(scrape_page, archive=False), urls))
+    server.shutdown()
+    page_parser.configure()
+    results = []
+    for url, (_, link) in zip(urls, pages):
+        result = results_by_url[url]
+        result["link"] = link
+        results.append(result)
+    return results
+
+def run(args):
+    exams = args.exam or exam_codes()
+    golden = load_golden(exams)
+    pages = load_pages(golden, args.corpus, args.archive)
+    if not pages:
+        print("No pages to parse.")
+        return 1
+    size = sum(len(content) for content, _ in pages)
+    print(f"{len(pages)} pages ({size / 1024 / 1024:.1f} MB) from {len(exams)} exams, backend {args.backend}")
+
+    start = time.perf_counter()
+    results = parse(pages, args)
+    elapsed = time.perf_counter() - start
+    # Memory is measured in a second run, tracemalloc would distort the timing
+    tracemalloc.start()
+    parse(pages, args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"Parsed in {elapsed:.2f} s - {len(pages) / elapsed:.1f} pages/s, peak memory {peak / 1024 / 1024:.1f} MB (main process)")
+    timings = time_fields(pages, args.backend)
+    for field, seconds in timings.items():
+        print(f"  {field:<12} {seconds * 1000 / len(pages):.3f} ms/page")
+
+    mismatches = 0
+    for result in results:
+        expected = dict(golden[result["link"]])
+        expected.setdefault("error", None)
+        if result != expected:
+            mismatches += 1
+            if mismatches <= 5:
+                fields = [key for key in expected if result.get(key) != expected.get(key)]
+                print(f"Mismatch in {result['link']}: {', '.join(fields)}")
+    if mismatches:
+        print(f"{mismatches} of {len(results)} questions differ from data/*.json")
+        return 1
+    print("All questions match data/*.json")
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the discussion page parser against the saved exams.")
+    parser.add_argument("--exam", action="append", help="Exam code from data/, can be repeated (default: all exams)")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--corpus", help="Directory with saved discussion pages and a links.json file")
+    source.add_argument("--archive", nargs="?", const=os.path.join(ROOT, page_archive.ARCHIVE_DIR),
+                        help="Read the pages from the page archive (default: data/archive)")
+    parser.add_argument("--backend", default="html.parser", choices=list(page_parser.BACKENDS))
+    parser.add_argument("--processes", type=int, default=0, help="Parse in a process pool of this size")
+    parser.add_argument("--serve", action="store_true", help="Fetch the pages from a local HTTP server through scrape_page")
+    parser.add_argument("--concurrency", type=int, default=4, help="Fetch concurrency with --serve")
+    sys.exit(run(parser.parse_args()))
@@ -0,0 +1,128 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+import jobs
+import pdf_cache
+import scraper
+
+DATA_DIR = "data"
+
+class ConsoleProgress:
+    # Stand-in for st.progress that prints to the terminal
+    def __init__(self, label=""):
+        self.label = label
+
+    def progress(self, value, text=""):
+        # Streamlit accepts both 0.0-1.0 and 0-100
+        percent = value if isinstance(value, int) and value > 1 else value * 100
+        print(f"\r{self.label} {percent:5.1f}% {text}".ljust(100), end="", flush=True)
+
+    def done(self, text):
+        print(f"\r{self.label} {text}".ljust(100), flush=True)
+
+def exam_codes(data_dir=DATA_DIR):
+    paths = glob.glob(os.path.join(data_dir, "*.json"))
+    return sorted(os.path.basename(p)[:-5] for p in paths if not p.endswith("_links.json"))
+
+def load_questions(exam_code, data_dir=DATA_DIR):
+    with open(os.path.join(data_dir, f"{exam_code}.json"), "r", encoding="utf-8") as f:
+        return json.load(f).get("questions", [])
+
+def build_pdfs(args):
+    for exam_code in args.exams or exam_codes():
+        progress = ConsoleProgress(exam_code)
+        questions = load_questions(exam_code)
+        if pdf_cache.cached_pdf(questions):
+            progress.done("up to date")
+            continue
+        path, missing_images = pdf_cache.get_pdf(questions, progress, args.processes)
+        if missing_images:
+            progress.done(f"built {path}, not cached: {len(missing_images)} images could not be loaded")
+        else:
+            progress.done(f"built {path}")
+    return 0
+
+def reextract(args):
+    codes = args.exams or [os.path.basename(p)[:-len("_links.json")] for p in sorted(glob.glob(os.path.join(DATA_DIR, "*_links.json")))]
+    for exam_code in codes:
+        progress = ConsoleProgress(exam_code)
+        parsed = scraper.reextract_exam(exam_code, progress, args.processes, args.backend)
+        progress.done(f"{parsed} pages extracted from the archive")
+    return 0
+
+def build_catalog(args):
+    for vendor in args.vendors:
+        exams = scraper.build_catalog(vendor)
+        print(f"{vendor}: {len(exams)} exams")
+    return 0
+
+def log_job(job):
+    stamp = time.strftime("%Y-%m-%d %H:%M:%S")
+    if job["state"] == "done":
+        print(f"{stamp} {job['exam_code']} done {job['error'] or ''}", flush=True)
+    else:
+        print(f"{stamp} {job['exam_code']} {job['progress']:6.1%} {job['text']}", flush=True)
+
+def scrape(args):
+    for exam_code in args.exams:
+        job = jobs.enqueue(exam_code, rapid_scraping=args.rapid, refresh=args.refresh)
+        if args.refresh and not job["refresh"]:
+            print(f"{exam_code}: {job['state']}, already scraping without --refresh, run it again once the job is done")
+        else:
+            print(f"{exam_code}: {job['state']}")
+    if args.background:
+        jobs.start_worker()
+        print(f"Scraping in the background, see {jobs.LOG_PATH}")
+        return 0
+    return worker(args)
+
+def worker(args):
+    if not jobs.work(callback=log_job):
+        print("Another worker is already running, it will pick up the queued jobs")
+    return 0
+
+def show_jobs(args):
+    for job in jobs.all_jobs():
+        print(f"{job['exam_code']:<20} {job['state']:<8} {job['progress']:6.1%} {job['error'] or job['text']}")
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ExamTopics Question Viewer command line tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    pdfs = subparsers.add_parser("build-pdfs", help="Pre-build the PDF exports of exams in data/")
+    pdfs.add_argument("exams", nargs="*", help="Exam codes (default: all exams in data/)")
+    pdfs.add_argument("--processes", type=int, default=os.cpu_count(), help="Render processes per exam")
+    pdfs.set_defaults(func=build_pdfs)
+
+    scrape_parser = subparsers.add_parser("scrape", help="Queue exams for scraping and run the queue")
+    scrape_parser.add_argument("exams", nargs="+", help="Exam codes")
+    scrape_parser.add_argument("--rapid", action="store_true", help="Use the rapid scraping preset")
+    scrape_parser.add_argument("--refresh", action="store_true", help="Only fetch new questions and changed discussions")
+    scrape_parser.add_argument("--background", action="store_true", help="Run the queue in a background worker and return")
+    scrape_parser.set_defaults(func=scrape)
+
+    reextract_parser = subparsers.add_parser("re-extract", help="Rebuild data/<exam>.json from the archived pages without fetching")
+    reextract_parser.add_argument("exams", nargs="*", help="Exam codes (default: all exams with a links file in data/)")
+    reextract_parser.add_argument("--processes", type=int, default=os.cpu_count(), help="Parser processes")
+    reextract_parser.add_argument("--backend", default="html.parser", help="Parser backend (html.parser or lxml)")
+    reextract_parser.set_defaults(func=reextract)
+
+    catalog_parser = subparsers.add_parser("build-catalog", help="Add all exams of the given vendors to the exam catalog")
+    catalog_parser.add_argument("vendors", nargs="+", help="Vendor names as in the ExamTopics URLs (e.g. servicenow)")
+    catalog_parser.set_defaults(func=build_catalog)
+
+    worker_parser = subparsers.add_parser("worker", help="Run queued scrape jobs until the queue is empty")
+    worker_parser.set_defaults(func=worker)
+
+    jobs_parser = subparsers.add_parser("jobs", help="Show the state of the scrape jobs")
+    jobs_parser.set_defaults(func=show_jobs)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
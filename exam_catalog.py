@@ -0,0 +1,66 @@
+import json
+import os
+import threading
+import time
+
+# Local catalog of known exams, so resolving the category of an exam is a lookup instead of
+# a search request. "exams" maps an exam code to its category and when it was resolved,
+# "categories" keeps the listing page count of a category and when its listing was last read.
+CATALOG_PATH = os.path.join("data", "catalog", "exams.json")
+# Entries older than this are resolved again
+CATALOG_TTL = 30 * 24 * 3600
+# A listing read less than this long ago is not read again: a resumed crawl reuses its page
+# count and a refresh reuses the changes the last check found
+LISTING_TTL = 5 * 60
+
+_lock = threading.Lock()
+
+def load(path=None):
+    try:
+        with open(path or CATALOG_PATH, "r", encoding="utf-8") as f:
+            catalog = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        catalog = {}
+    catalog.setdefault("exams", {})
+    catalog.setdefault("categories", {})
+    return catalog
+
+def save(catalog, path=None):
+    path = path or CATALOG_PATH
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(catalog, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def _key(exam_code):
+    return exam_code.strip().upper()
+
+def lookup(exam_code, ttl=CATALOG_TTL, path=None):
+    # Category of the exam, or None if it is unknown or the entry expired
+    entry = load(path)["exams"].get(_key(exam_code))
+    if not entry or time.time() - entry["resolved_at"] > ttl:
+        return None
+    return entry["category"]
+
+def category_info(category, ttl=LISTING_TTL, path=None):
+    # Page count and check time of the category's listing, or None if it is unknown or expired
+    info = load(path)["categories"].get(category)
+    if not info or time.time() - info["checked_at"] > ttl:
+        return None
+    return info
+
+def record_exams(categories, path=None):
+    # categories maps exam codes to their category
+    now = time.time()
+    with _lock:
+        catalog = load(path)
+        for exam_code, category in categories.items():
+            catalog["exams"][_key(exam_code)] = {"category": category, "resolved_at": now}
+        save(catalog, path)
+
+def record_category(category, num_pages, path=None):
+    with _lock:
+        catalog = load(path)
+        catalog["categories"][category] = {"num_pages": num_pages, "checked_at": time.time()}
+        save(catalog, path)
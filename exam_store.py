@@ -0,0 +1,215 @@
+import glob
+import html
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+from answer_stats import AnswerStats
+
+# SQLite copy of data/<exam>.json. Questions are stored one row each, with the comments in a
+# separate column, so opening an exam reads only the small meta table and a single question
+# can be loaded by number without touching the rest of the exam.
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE questions (
+    position INTEGER PRIMARY KEY,
+    question_number TEXT,
+    link TEXT,
+    body TEXT,
+    comments TEXT
+);
+CREATE INDEX questions_number ON questions (question_number);
+CREATE TABLE stats (name TEXT PRIMARY KEY, typecode TEXT, data BLOB);
+CREATE VIRTUAL TABLE search USING fts5(question, answers, comments, tokenize='unicode61 remove_diacritics 2');
+"""
+# Stores written by an older version are converted again when they are opened
+STORE_VERSION = "3"
+SEARCH_LIMIT = 20
+# Matches in the question count more than matches in the answers, and those more than comments
+SEARCH_SQL = """
+SELECT questions.question_number, -bm25(search, 3.0, 2.0, 1.0) AS score,
+       snippet(search, -1, '**', '**', '…', 12)
+FROM search JOIN questions ON questions.position = search.rowid
+WHERE search MATCH ?
+ORDER BY score DESC
+LIMIT ?
+"""
+TAG_RE = re.compile(r"<[^>]+>")
+
+def plain_text(html_text):
+    return html.unescape(TAG_RE.sub(" ", html_text or ""))
+
+def search_text(question):
+    comments = []
+    for comment in question.get("comments", []):
+        comments.append(comment.get("content", ""))
+        comments.extend(comment.get("replies", []))
+    return plain_text(question.get("question")), "\n".join(question.get("answers", [])), "\n".join(comments)
+
+def fts_query(text, operator=" "):
+    # Quoted parts of the text are phrases, everything else single words. Every term is
+    # quoted, so the user's input never runs into the FTS5 query syntax.
+    terms = []
+    for phrase, word in re.findall(r'"([^"]*)"|(\S+)', text):
+        words = re.findall(r"\w+", phrase or word)
+        if words:
+            terms.append('"' + " ".join(words) + '"')
+    return operator.join(terms)
+
+def store_path(json_path):
+    return os.path.splitext(json_path)[0] + ".db"
+
+def write_exam(questions_obj, db_path):
+    # Unique per writer, so the worker and app threads converting the same exam at the
+    # same time never share a half-written file; the last complete copy wins
+    tmp_path = f"{db_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.executescript(SCHEMA)
+        questions = questions_obj.get("questions", [])
+        conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+            ("status", questions_obj.get("status", "in progress")),
+            ("error", questions_obj.get("error", "")),
+            ("count", str(len(questions))),
+            ("version", STORE_VERSION),
+        ])
+        rows = []
+        for position, question in enumerate(questions):
+            # Comments are kept in their own column, the placeholder keeps the key order
+            body = dict(question, comments=None)
+            rows.append((
+                position,
+                question.get("question_number"),
+                question.get("link"),
+                json.dumps(body, ensure_ascii=False),
+                json.dumps(question.get("comments", []), ensure_ascii=False),
+            ))
+        conn.executemany("INSERT INTO questions VALUES (?, ?, ?, ?, ?)", rows)
+        conn.executemany(
+            "INSERT INTO search (rowid, question, answers, comments) VALUES (?, ?, ?, ?)",
+            [(position, *search_text(question)) for position, question in enumerate(questions)],
+        )
+        conn.executemany("INSERT INTO stats VALUES (?, ?, ?)", AnswerStats.compute(questions).dump())
+        conn.commit()
+    except Exception:
+        conn.close()
+        os.remove(tmp_path)
+        raise
+    conn.close()
+    os.replace(tmp_path, db_path)
+
+def convert(json_path):
+    with open(json_path, "r", encoding="utf-8") as f:
+        questions_obj = json.load(f)
+    db_path = store_path(json_path)
+    write_exam(questions_obj, db_path)
+    return db_path
+
+def open_exam(json_path):
+    # Opens the store of an exam, converting the JSON file first if the store is missing or older
+    db_path = store_path(json_path)
+    if not os.path.exists(db_path) or os.path.getmtime(db_path) < os.path.getmtime(json_path):
+        convert(json_path)
+    store = ExamStore(db_path)
+    if store.meta.get("version") != STORE_VERSION:
+        store.close()
+        convert(json_path)
+        store = ExamStore(db_path)
+    return store
+
+def search_exams(query, json_paths, limit=SEARCH_LIMIT):
+    # Searches several exams, returns (exam_code, question_number, score, snippet) best first
+    results = []
+    for json_path in json_paths:
+        exam_code = os.path.splitext(os.path.basename(json_path))[0]
+        store = open_exam(json_path)
+        try:
+            results.extend((exam_code, *row) for row in store.search(query, limit))
+        finally:
+            store.close()
+    return sorted(results, key=lambda result: result[2], reverse=True)[:limit]
+
+class ExamStore:
+    def __init__(self, db_path):
+        self.db_path = db_path
+        # One store can be shared by all sessions of the app, the lock serializes its queries
+        self.conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.meta = dict(self._query("SELECT key, value FROM meta"))
+        self._answer_stats = None
+
+    def _query(self, sql, params=()):
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    @property
+    def status(self):
+        return self.meta.get("status", "in progress")
+
+    @property
+    def error(self):
+        return self.meta.get("error", "")
+
+    def __len__(self):
+        return int(self.meta.get("count", 0))
+
+    def numbers(self):
+        return [row[0] for row in self._query("SELECT question_number FROM questions ORDER BY position")]
+
+    def get(self, question_number, with_comments=True):
+        rows = self._query(
+            "SELECT body, comments FROM questions WHERE question_number = ? ORDER BY position LIMIT 1",
+            (str(question_number),),
+        )
+        if not rows:
+            return None
+        row = rows[0]
+        question = json.loads(row[0])
+        if with_comments:
+            question["comments"] = json.loads(row[1])
+        else:
+            question.pop("comments")
+        return question
+
+    def comments(self, question_number):
+        rows = self._query(
+            "SELECT comments FROM questions WHERE question_number = ? ORDER BY position LIMIT 1",
+            (str(question_number),),
+        )
+        return json.loads(rows[0][0]) if rows else []
+
+    def questions(self):
+        for body, comments in self._query("SELECT body, comments FROM questions ORDER BY position"):
+            question = json.loads(body)
+            question["comments"] = json.loads(comments)
+            yield question
+
+    def answer_stats(self):
+        # Rows follow the order of the questions in the exam
+        if self._answer_stats is None:
+            self._answer_stats = AnswerStats.load(self._query("SELECT name, typecode, data FROM stats"))
+        return self._answer_stats
+
+    def search(self, query, limit=SEARCH_LIMIT):
+        # Ranked full-text search over question, answers and comments. Questions with all the
+        # words come first; if there are none, questions with any of them.
+        # Returns (question_number, score, snippet), best match first.
+        for operator in (" ", " OR "):
+            match = fts_query(query, operator)
+            if not match:
+                return []
+            rows = self._query(SEARCH_SQL, (match, limit))
+            if rows:
+                return rows
+        return []
+
+    def close(self):
+        self.conn.close()
+
+if __name__ == "__main__":
+    # python exam_store.py [data/CSA.json ...] converts the given exams, or all exams in data/
+    paths = sys.argv[1:] or [p for p in glob.glob(os.path.join("data", "*.json")) if not p.endswith("_links.json")]
+    for path in paths:
+        print(f"{path} -> {convert(path)}")
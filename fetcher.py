@@ -0,0 +1,171 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlparse
+import http_client
+
+# Presets for the request budget. "default" matches the old fixed 5 second sleep,
+# "rapid" replaces the old rapid_scraping flag. Category listing pages were always fetched
+# without a delay, "listing" keeps that and "listing_rapid" fetches them in parallel.
+RATE_PRESETS = {
+    "default": {"requests_per_second": 0.2, "concurrency": 1},
+    "rapid": {"requests_per_second": 2.0, "concurrency": 4},
+    "listing": {"requests_per_second": None, "concurrency": 1},
+    "listing_rapid": {"requests_per_second": None, "concurrency": 4},
+}
+
+class TokenBucket:
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if not self.rate:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_time = (1 - self.tokens) / self.rate
+            time.sleep(wait_time)
+
+# Failure kinds that mean the site is pushing back, and failures worth trying again later
+THROTTLE_KINDS = {"rate_limited", "blocked", "captcha", "timeout", "connection", "server"}
+RETRY_KINDS = THROTTLE_KINDS | {"parse"}
+
+class AdaptiveController:
+    # AIMD concurrency with exponential backoff. Every throttling failure halves the number
+    # of parallel requests and pauses all requests for base_delay * 2^(failures in a row - 1)
+    # seconds (at most max_delay, with jitter, at least Retry-After); every increase_after
+    # successes in a row allow one more parallel request again, up to max_concurrency.
+    def __init__(self, max_concurrency, base_delay=5, max_delay=300, increase_after=20, give_up_after=8):
+        self.max_concurrency = max(1, max_concurrency)
+        self.concurrency = self.max_concurrency
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.increase_after = increase_after
+        self.give_up_after = give_up_after
+        self.failures = 0
+        self.successes = 0
+        self.resume_at = 0
+        self.lock = threading.Lock()
+
+    @property
+    def gave_up(self):
+        # Too many throttling failures in a row, the IP is most likely blocked for now
+        return self.failures >= self.give_up_after
+
+    def wait(self):
+        while True:
+            with self.lock:
+                wait_time = self.resume_at - time.monotonic()
+            if wait_time <= 0:
+                return
+            time.sleep(wait_time)
+
+    def record(self, kind, retry_after=None):
+        with self.lock:
+            if kind is None:
+                self.failures = 0
+                self.successes += 1
+                if self.successes >= self.increase_after and self.concurrency < self.max_concurrency:
+                    self.concurrency += 1
+                    self.successes = 0
+            elif kind in THROTTLE_KINDS:
+                self.failures += 1
+                self.successes = 0
+                self.concurrency = max(1, self.concurrency // 2)
+                delay = min(self.max_delay, self.base_delay * 2 ** (self.failures - 1))
+                delay = max(delay / 2 + random.uniform(0, delay / 2), retry_after or 0)
+                self.resume_at = max(self.resume_at, time.monotonic() + delay)
+
+class FetchEngine:
+    def __init__(self, requests_per_second=0.2, concurrency=1, sessions=None, proxies=None, adaptive=False):
+        self.requests_per_second = requests_per_second
+        self.concurrency = max(1, concurrency)
+        self.controller = AdaptiveController(self.concurrency) if adaptive else None
+        if sessions:
+            self.sessions = list(sessions)
+        elif proxies:
+            self.sessions = [http_client.new_session(proxy) for proxy in proxies]
+        else:
+            self.sessions = [http_client.get_session()]
+        self.buckets = {}
+        self.lock = threading.Lock()
+        self.session_index = 0
+
+    @classmethod
+    def from_preset(cls, name, **kwargs):
+        budget = dict(RATE_PRESETS[name])
+        budget.update(kwargs)
+        return cls(**budget)
+
+    def _bucket(self, url, session):
+        # Each session is a separate egress, so the per-host budget is kept per session
+        key = (urlparse(url).netloc, id(session))
+        with self.lock:
+            if key not in self.buckets:
+                self.buckets[key] = TokenBucket(self.requests_per_second)
+            return self.buckets[key]
+
+    def next_session(self):
+        with self.lock:
+            session = self.sessions[self.session_index % len(self.sessions)]
+            self.session_index += 1
+            return session
+
+    def _run(self, func, url):
+        session = self.next_session()
+        if self.controller:
+            self.controller.wait()
+        self._bucket(url, session).acquire()
+        return func(url, session)
+
+    def _limit(self):
+        return self.controller.concurrency if self.controller else self.concurrency
+
+    def map(self, func, urls, stop_on=None, feedback=None):
+        # Calls func(url, session) for every url and yields (url, result) as calls finish.
+        # Once stop_on(result) is true no new calls are started, but calls already
+        # in flight are still yielded so their results are not lost. With an adaptive
+        # engine, feedback(result) returns (failure kind or None, Retry-After seconds)
+        # for the controller, which then sets the number of parallel calls.
+        urls = iter(urls)
+        stopped = False
+        executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        pending = {}
+
+        def fill():
+            while not stopped and len(pending) < self._limit():
+                next_url = next(urls, None)
+                if next_url is None:
+                    return
+                pending[executor.submit(self._run, func, next_url)] = next_url
+
+        try:
+            fill()
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    url = pending.pop(future)
+                    result = future.result()
+                    if self.controller and feedback:
+                        self.controller.record(*feedback(result))
+                        if self.controller.gave_up:
+                            stopped = True
+                    if stop_on and stop_on(result):
+                        stopped = True
+                    yield url, result
+                fill()
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
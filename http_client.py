@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import brotli  # noqa: F401 - lets urllib3 decode "br" responses
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    ACCEPT_ENCODING = "gzip, deflate"
+
+HEADERS = {
+            "User-Agent": (
+                "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+                "AppleWebKit/537.36 (KHTML, like Gecko) "
+                "Chrome/122.0.0.0 Safari/537.36"
+            ),
+            "Accept-Language": "en-US,en;q=0.9",
+            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
+            "Accept-Encoding": ACCEPT_ENCODING,
+            "Referer": "https://google.com",
+            "Connection": "keep-alive",
+        }
+# (connect, read) timeout in seconds
+DEFAULT_TIMEOUT = (10, 30)
+CACHE_DIR = os.path.join(".cache", "http")
+POOL_SIZE = 10
+
+_shared_session = None
+_session_lock = threading.Lock()
+
+def new_session(proxy=None, pool_size=POOL_SIZE):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update(HEADERS)
+    if proxy:
+        session.proxies = {"http": proxy, "https": proxy}
+    return session
+
+def get_session():
+    global _shared_session
+    with _session_lock:
+        if _shared_session is None:
+            _shared_session = new_session()
+        return _shared_session
+
+def _cache_paths(url):
+    key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+    base = os.path.join(CACHE_DIR, key[:2], key)
+    return base + ".json", base + ".body"
+
+def _load_cached(url):
+    meta_path, body_path = _cache_paths(url)
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(body_path, "rb") as f:
+            body = f.read()
+    except (OSError, json.JSONDecodeError):
+        return None, None
+    return meta, body
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def _store_cached(url, response):
+    meta = {
+        "url": url,
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "encoding": response.encoding,
+        "fetched_at": time.time(),
+    }
+    meta_path, body_path = _cache_paths(url)
+    os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+    # Body first, so the metadata never points at a missing or partial body
+    _write_atomic(body_path, response.content)
+    _write_atomic(meta_path, json.dumps(meta).encode("utf-8"))
+
+def discard_cached(url):
+    for path in _cache_paths(url):
+        if os.path.exists(path):
+            os.remove(path)
+
+def _touch_cached(url, meta):
+    # A 304 confirms the cached body, so its age starts over
+    meta = dict(meta, fetched_at=time.time())
+    meta_path, _ = _cache_paths(url)
+    _write_atomic(meta_path, json.dumps(meta).encode("utf-8"))
+
+def _cached_response(response, meta, body):
+    response.status_code = 200
+    response._content = body
+    response.encoding = meta.get("encoding")
+    response.from_cache = True
+    return response
+
+def get(url, session=None, headers=None, timeout=DEFAULT_TIMEOUT, revalidate=False, ttl=None,
+        stale_if_error=False, **kwargs):
+    # With revalidate=True the ETag/Last-Modified validators of the previous response are
+    # sent along, and a 304 answer is turned into a normal response with the cached body.
+    # A cached body younger than ttl seconds is returned without any request, and with
+    # stale_if_error=True an older one is returned when the request fails.
+    session = session or get_session()
+    request_headers = dict(HEADERS)
+    request_headers.update(headers or {})
+    meta, body = _load_cached(url) if revalidate else (None, None)
+    if meta and ttl is not None and time.time() - meta.get("fetched_at", 0) < ttl:
+        return _cached_response(requests.Response(), dict(meta), body)
+    if meta:
+        if meta.get("etag"):
+            request_headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            request_headers["If-Modified-Since"] = meta["last_modified"]
+
+    try:
+        response = session.get(url, headers=request_headers, timeout=timeout, **kwargs)
+    except requests.RequestException:
+        if meta and stale_if_error:
+            return _cached_response(requests.Response(), dict(meta), body)
+        raise
+    response.from_cache = False
+    if response.status_code == 304 and meta:
+        _touch_cached(url, meta)
+        return _cached_response(response, meta, body)
+    if revalidate and response.status_code == 200 and (response.headers.get("ETag") or response.headers.get("Last-Modified")):
+        _store_cached(url, response)
+    return response
@@ -0,0 +1,87 @@
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import http_client
+
+# Images are stored once per content hash in blobs/, and urls/ maps the hash of a URL to the
+# content hash, so the same image used under several URLs takes space only once.
+CACHE_DIR = os.path.join(".cache", "images")
+MAX_CACHE_BYTES = 200 * 1024 * 1024
+IMAGE_TIMEOUT = 5
+PREFETCH_WORKERS = 8
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+def _url_path(url):
+    key = _sha256(url.encode("utf-8"))
+    return os.path.join(CACHE_DIR, "urls", key[:2], key)
+
+def _blob_path(digest):
+    return os.path.join(CACHE_DIR, "blobs", digest[:2], digest)
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def get_cached(url):
+    try:
+        with open(_url_path(url), "r", encoding="utf-8") as f:
+            blob_path = _blob_path(f.read().strip())
+        with open(blob_path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    os.utime(blob_path)  # keeps recently used images out of eviction
+    return data
+
+def store(url, data):
+    digest = _sha256(data)
+    blob_path = _blob_path(digest)
+    if not os.path.exists(blob_path):
+        _write_atomic(blob_path, data)
+    _write_atomic(_url_path(url), digest.encode("utf-8"))
+
+def fetch(url, session=None):
+    data = get_cached(url)
+    if data is not None:
+        return data
+    try:
+        response = http_client.get(url, session=session, timeout=IMAGE_TIMEOUT)
+        if response.status_code != 200:
+            return None
+        data = response.content
+    except Exception as e:
+        print(f"Failed to fetch image {url}: {e}")
+        return None
+    store(url, data)
+    return data
+
+def prefetch(urls, workers=PREFETCH_WORKERS):
+    # Downloads all uncached images concurrently and returns {url: available}. The image
+    # bytes are not kept, callers read them from the cache when they need them.
+    urls = list(dict.fromkeys(urls))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        available = dict(zip(urls, (data is not None for data in executor.map(fetch, urls))))
+    evict()
+    return available
+
+def evict(max_bytes=MAX_CACHE_BYTES):
+    # Removes the least recently used images until the cache fits into max_bytes.
+    # URL entries of removed images are left behind and treated as misses.
+    blobs = []
+    for root, _, files in os.walk(os.path.join(CACHE_DIR, "blobs")):
+        for name in files:
+            path = os.path.join(root, name)
+            stat = os.stat(path)
+            blobs.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in blobs)
+    for _, size, path in sorted(blobs):
+        if total <= max_bytes:
+            break
+        os.remove(path)
+        total -= size
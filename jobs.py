@@ -0,0 +1,161 @@
+import glob
+import os
+import subprocess
+import sys
+import threading
+import time
+import scraper
+
+# Scrape jobs run in a separate worker process, so a scrape goes on when the browser tab that
+# started it is closed. Each job is a small JSON file in JOBS_DIR that only the worker updates
+# once the job is queued; the app and the command line just read it.
+JOBS_DIR = os.path.join("data", "jobs")
+LOCK_PATH = os.path.join(JOBS_DIR, "worker.lock")
+LOG_PATH = os.path.join(JOBS_DIR, "worker.log")
+CLI_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cli.py")
+# The worker touches its lock file every HEARTBEAT_INTERVAL seconds, a lock that was not
+# touched for LOCK_TIMEOUT seconds belongs to a worker that died
+HEARTBEAT_INTERVAL = 10
+LOCK_TIMEOUT = 60
+PROGRESS_INTERVAL = 0.5
+POLL_INTERVAL = 1
+
+def job_path(exam_code):
+    return os.path.join(JOBS_DIR, f"{exam_code}.json")
+
+def load_job(exam_code):
+    return scraper.load_json(job_path(exam_code)) or None
+
+def save_job(job):
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    job["updated"] = time.time()
+    scraper.save_json(job, job_path(job["exam_code"]))
+
+def all_jobs():
+    jobs = [scraper.load_json(path) for path in glob.glob(os.path.join(JOBS_DIR, "*.json"))]
+    return sorted((job for job in jobs if job), key=lambda job: job["created"])
+
+def enqueue(exam_code, rapid_scraping=False, refresh=False):
+    # Returns the queued or running job of the exam if there is one, otherwise queues a new job
+    job = load_job(exam_code)
+    if job and job["state"] in ("queued", "running"):
+        return job
+    job = {
+        "exam_code": exam_code,
+        "state": "queued",
+        "rapid_scraping": rapid_scraping,
+        "refresh": refresh,
+        "progress": 0.0,
+        "text": "Waiting for the scraper to start...",
+        "error": "",
+        "created": time.time(),
+    }
+    save_job(job)
+    return job
+
+class JobProgress:
+    # Stand-in for st.progress that records the progress in the job file, at most every
+    # PROGRESS_INTERVAL seconds, and passes the job to callback after every save
+    def __init__(self, job, callback=None):
+        self.job = job
+        self.callback = callback
+        self.last_save = 0
+
+    def progress(self, value, text=""):
+        # Streamlit accepts both 0.0-1.0 and 0-100
+        self.job["progress"] = value / 100 if isinstance(value, int) and value > 1 else float(value)
+        self.job["text"] = text
+        now = time.monotonic()
+        if now - self.last_save >= PROGRESS_INTERVAL:
+            self.last_save = now
+            save_job(self.job)
+            if self.callback:
+                self.callback(self.job)
+
+def run_job(job, callback=None):
+    job.update(state="running", error="", started=time.time())
+    save_job(job)
+    progress = JobProgress(job, callback)
+    try:
+        error = scraper.scrape_exam(job["exam_code"], progress, job["rapid_scraping"], job["refresh"])
+    except Exception as e:
+        error = f"Scraping failed: {e}"
+    job.update(state="done", error=error, finished=time.time())
+    if not error:
+        job.update(progress=1.0, text="Done")
+    save_job(job)
+    if callback:
+        callback(job)
+    return job
+
+def worker_running():
+    try:
+        return time.time() - os.path.getmtime(LOCK_PATH) < LOCK_TIMEOUT
+    except OSError:
+        return False
+
+def _acquire_lock():
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    if worker_running():
+        return False
+    if os.path.exists(LOCK_PATH):
+        os.remove(LOCK_PATH)  # left behind by a worker that died
+    try:
+        fd = os.open(LOCK_PATH, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return False
+    with os.fdopen(fd, "w") as f:
+        f.write(str(os.getpid()))
+    return True
+
+def _heartbeat(stop):
+    while not stop.wait(HEARTBEAT_INTERVAL):
+        os.utime(LOCK_PATH)
+
+def work(callback=None):
+    # Runs queued jobs, oldest first, until the queue is empty. Returns False without running
+    # anything if another worker is already running.
+    if not _acquire_lock():
+        return False
+    stop = threading.Event()
+    threading.Thread(target=_heartbeat, args=(stop,), daemon=True).start()
+    try:
+        # Jobs left running by a worker that died are queued again, the scraper resumes them
+        # from the saved links and its checkpoint log
+        for job in all_jobs():
+            if job["state"] == "running":
+                job["state"] = "queued"
+                save_job(job)
+        while True:
+            queued = [job for job in all_jobs() if job["state"] == "queued"]
+            if not queued:
+                break
+            run_job(queued[0], callback)
+    finally:
+        stop.set()
+        os.remove(LOCK_PATH)
+    return True
+
+def start_worker():
+    # Starts "python cli.py worker" detached from the calling process, its output goes to LOG_PATH
+    if worker_running():
+        return
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    if os.name == "nt":
+        detach = {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP | subprocess.DETACHED_PROCESS}
+    else:
+        detach = {"start_new_session": True}
+    with open(LOG_PATH, "a") as log:
+        subprocess.Popen([sys.executable, CLI_PATH, "worker"], stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT, **detach)
+
+def wait(exam_code, progress, poll_interval=POLL_INTERVAL):
+    # Shows the progress of the exam's job on progress until the job is done and returns it.
+    # A worker is started again if none is running and the job has not moved for a while.
+    while True:
+        job = load_job(exam_code)
+        if job is None or job["state"] == "done":
+            return job
+        progress.progress(job["progress"], text=job["text"])
+        if not worker_running() and time.time() - job["updated"] > HEARTBEAT_INTERVAL:
+            start_worker()
+        time.sleep(poll_interval)
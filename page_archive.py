@@ -0,0 +1,68 @@
+import gzip
+import json
+import os
+import threading
+import time
+
+# Append-only archive of the raw discussion pages, so the questions can be extracted again
+# without downloading anything. Every page is stored as a separate gzip member appended to
+# the current segment file, and index.jsonl records where it is. Records are never changed;
+# a page fetched again is appended, and the newest record of a URL wins.
+ARCHIVE_DIR = os.path.join("data", "archive")
+INDEX_NAME = "index.jsonl"
+SEGMENT_BYTES = 256 * 1024 * 1024
+COMPRESS_LEVEL = 6
+
+_lock = threading.Lock()
+
+def _segment_path(segment, archive_dir):
+    return os.path.join(archive_dir, f"pages-{segment:04d}.gz")
+
+def _current_segment(archive_dir):
+    segments = [int(name[6:10]) for name in os.listdir(archive_dir) if name.startswith("pages-") and name.endswith(".gz")]
+    segment = max(segments, default=1)
+    path = _segment_path(segment, archive_dir)
+    if os.path.exists(path) and os.path.getsize(path) >= SEGMENT_BYTES:
+        segment += 1
+    return segment
+
+def append(url, content, archive_dir=None):
+    archive_dir = archive_dir or ARCHIVE_DIR
+    data = gzip.compress(content, compresslevel=COMPRESS_LEVEL)
+    with _lock:
+        os.makedirs(archive_dir, exist_ok=True)
+        segment = _current_segment(archive_dir)
+        with open(_segment_path(segment, archive_dir), "ab") as f:
+            offset = f.tell()
+            f.write(data)
+        # The index line is written after the page, so it never points at missing data
+        record = {"url": url, "fetched_at": time.time(), "segment": segment, "offset": offset, "length": len(data)}
+        with open(os.path.join(archive_dir, INDEX_NAME), "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+
+def load_index(archive_dir=None):
+    # Returns {url: newest record}
+    archive_dir = archive_dir or ARCHIVE_DIR
+    index = {}
+    try:
+        with open(os.path.join(archive_dir, INDEX_NAME), "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # a line cut off by a crash
+                if record["fetched_at"] >= index.get(record["url"], {}).get("fetched_at", 0):
+                    index[record["url"]] = record
+    except OSError:
+        pass
+    return index
+
+def read(record, archive_dir=None):
+    archive_dir = archive_dir or ARCHIVE_DIR
+    with open(_segment_path(record["segment"], archive_dir), "rb") as f:
+        f.seek(record["offset"])
+        return gzip.decompress(f.read(record["length"]))
+
+def get(url, archive_dir=None):
+    record = load_index(archive_dir).get(url)
+    return read(record, archive_dir) if record else None
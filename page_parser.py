@@ -0,0 +1,169 @@
+from concurrent.futures import ProcessPoolExecutor
+import json
+import re
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    import lxml  # noqa: F401
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+# Only these subtrees of a discussion page are used, the rest of the page is never built
+PARSED_CLASSES = {"question-body", "voted-answers-tally", "discussion-container"}
+
+def _is_parsed_class(value):
+    # While parsing, the class attribute can still be the raw "card-body question-body" string
+    if not value:
+        return False
+    classes = value.split() if isinstance(value, str) else value
+    return any(c in PARSED_CLASSES for c in classes)
+
+PARSE_ONLY = SoupStrainer("div", class_=_is_parsed_class)
+BACKENDS = {
+    "html.parser": "html.parser",
+    "lxml": "lxml",
+}
+
+_backend = "html.parser"
+_pool = None
+
+def configure(backend="html.parser", processes=None):
+    # processes > 0 parses pages in a process pool, so parsing does not compete
+    # with the fetch threads for the GIL
+    global _backend, _pool
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown parser backend {backend}. Available: {', '.join(BACKENDS)}")
+    if backend == "lxml" and not LXML_AVAILABLE:
+        raise ValueError("The lxml backend requires the lxml package.")
+    if _pool:
+        _pool.shutdown()
+        _pool = None
+    _backend = backend
+    if processes:
+        _pool = ProcessPoolExecutor(max_workers=processes)
+
+def make_soup(content, backend=None):
+    return BeautifulSoup(content, BACKENDS[backend or _backend], parse_only=PARSE_ONLY)
+
+def extract_question_text(soup):
+    question = ""
+    try:
+        question_div = soup.find("div", class_="question-body")
+        question_content = question_div.find("p", class_="card-text") if question_div else None
+        if question_content:
+            question = question_content.decode_contents().strip()
+    except Exception:
+        pass
+    return question
+
+def extract_most_voted(soup):
+    most_voted = None
+    try:
+        voted_answers = soup.find("div", class_="voted-answers-tally")
+        if voted_answers:
+            script_content = voted_answers.find("script")
+            if script_content and script_content.string:
+                voted_json = json.loads(script_content.string)
+                most_voted_object = next((item for item in voted_json if item.get('is_most_voted')), None)
+                if most_voted_object:
+                    most_voted = most_voted_object.get("voted_answers", None)
+    except Exception:
+        pass
+    return most_voted
+
+def extract_answers(soup):
+    answers = []
+    try:
+        question_div = soup.find("div", class_="question-body")
+        if question_div:
+            answers_div = question_div.find("div", class_="question-choices-container")
+            if answers_div:
+                answer_options = answers_div.find_all("li")
+                if answer_options:
+                    answers = [re.sub(r'\s+', ' ', answer_option.text).strip() for answer_option in answer_options]
+    except Exception:
+        pass
+    return answers
+
+def extract_comments(soup):
+    comments = []
+    try:
+        discussion_div = soup.find("div", class_="discussion-container")
+        comment_divs = discussion_div.find_all("div", class_="comment-container", recursive=False) if discussion_div else []
+        for comment_div in comment_divs:
+            comment = {}
+            try:
+                comment_content_div = comment_div.find("div", class_="comment-content")
+                comment_content = comment_content_div.text.strip() if comment_content_div else ""
+            except Exception:
+                comment_content = ""
+
+            try:
+                comment_selected_answer = comment_div.find("div", class_="comment-selected-answers")
+                selected_answer = comment_selected_answer.find("span").text.strip() if comment_selected_answer else ""
+            except Exception:
+                selected_answer = ""
+
+            replies = []
+            try:
+                comment_replies_div = comment_div.find("div", class_="comment-replies")
+                if comment_replies_div:
+                    reply_divs = comment_replies_div.find_all("div", class_="comment-container")
+                    for reply in reply_divs:
+                        try:
+                            reply_content = reply.find("div", class_="comment-content").text.strip()
+                        except Exception:
+                            reply_content = ""
+                        replies.append(reply_content)
+            except Exception:
+                pass
+
+            comment["content"] = comment_content
+            comment["selected_answer"] = selected_answer
+            comment["replies"] = replies
+
+            comments.append(comment)
+    except Exception:
+        pass
+    return comments
+
+# Field extractors in the order the question object is built; used by the benchmark for per-field timing
+EXTRACTORS = {
+    "question": extract_question_text,
+    "answers": extract_answers,
+    "comments": extract_comments,
+    "most_voted": extract_most_voted,
+}
+
+def extract_question(content, link, backend=None):
+    soup = make_soup(content, backend)
+
+    question_number_match = re.search(r"question-(\d+)", link)
+    question_number = question_number_match.group(1) if question_number_match else "unknown"
+
+    question_object = {}
+    question_object["question"] = extract_question_text(soup)
+    question_object["answers"] = extract_answers(soup)
+    question_object["comments"] = extract_comments(soup)
+    question_object["question_number"] = question_number
+    question_object["link"] = link
+    question_object["most_voted"] = extract_most_voted(soup)
+    question_object["error"] = None
+
+    return question_object
+
+def parse_page(content, link):
+    if _pool:
+        return _pool.submit(extract_question, content, link, _backend).result()
+    return extract_question(content, link)
+
+def parse_pages(pages, processes=None, backend=None):
+    # pages is an iterable of (content, link) pairs; results keep the input order
+    pages = list(pages)
+    if not processes:
+        return [extract_question(content, link, backend) for content, link in pages]
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        contents = [content for content, _ in pages]
+        links = [link for _, link in pages]
+        return list(pool.map(extract_question, contents, links, [backend] * len(pages), chunksize=8))
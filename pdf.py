@@ -3,77 +3,58 @@ from reportlab.lib import utils
 from reportlab.pdfgen import canvas
 from reportlab.lib.utils import ImageReader
 from reportlab.lib import colors
-import requests
+import image_cache
+import pdf_merge
+import text_layout
 from io import BytesIO
+import multiprocessing
+import os
+import tempfile
 from bs4 import BeautifulSoup
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-def fetch_image_from_url(url):
-    try:
-        response = requests.get(url, stream=True, timeout=5)
-        if response.status_code == 200:
-            return ImageReader(BytesIO(response.content))
-    except Exception as e:
-        print(f"Failed to fetch image {url}: {e}")
-    return None
+IMAGE_PREFIX = "https://www.examtopics.com"
+# Questions per partial PDF; larger exports are rendered in chunks to bound memory
+CHUNK_SIZE = 50
+# Render processes are capped at this, whatever the caller asks for
+MAX_RENDER_PROCESSES = 4
+# Question numbers above this are rejected, so a range like 1-100000000 is not expanded
+MAX_QUESTION_NUMBER = 10000
 
 def wrap_text(text, max_width, font, font_size, new_line=False):
-    from reportlab.pdfgen import canvas
-    from io import BytesIO
-    c = canvas.Canvas(BytesIO())
-    c.setFont(font, font_size)
-
-    lines = []
-    for paragraph in text.split('\n'):
-        words = paragraph.split()
-        current_line = ""
-
-        for word in words:
-            test_line = f"{current_line} {word}".strip()
-            if c.stringWidth(test_line, font, font_size) <= max_width:
-                current_line = test_line
-            else:
-                # If the word itself is too long, split it
-                if c.stringWidth(word, font, font_size) > max_width:
-                    if current_line:
-                        lines.append(current_line)
-                        current_line = ""
-                    # Break the word into chunks
-                    chunk = ""
-                    for char in word:
-                        if c.stringWidth(chunk + char, font, font_size) <= max_width:
-                            chunk += char
-                        else:
-                            lines.append(chunk)
-                            chunk = char
-                    if chunk:
-                        current_line = chunk
-                else:
-                    lines.append(current_line)
-                    current_line = word
-
-        if current_line:
-            lines.append(current_line)
-        if new_line:
-            lines.append("")
-
-    return lines
-
-def generate_pdf(questions, progress):
-    total = len(questions)
-    buffer = BytesIO()
-    c = canvas.Canvas(buffer, pagesize=letter)
+    return text_layout.wrap_text(text, max_width, font, font_size, new_line)
+
+def parse_question_html(question_html):
+    # A single parse gives both the plain text and the image URLs of a question
+    soup = BeautifulSoup(question_html, "html.parser")
+    urls = []
+    for img in soup.find_all("img"):
+        src = img.get("src", "")
+        if src.startswith("/"):
+            src = IMAGE_PREFIX + src
+        urls.append(src)
+    for br in soup.find_all("br"):
+        br.replace_with("\n")
+    return soup.get_text(), urls
+
+def render_questions(c, questions, parsed, available_images, on_question=None, options=None):
+    options = options or {}
+    include_discussion = options.get("include_discussion", True)
+    max_comments = options.get("max_comments")
+    most_voted_only = options.get("most_voted_only", False)
     width, height = letter
     y = height - 40  # start from top
-    questions = sorted(questions, key=lambda q: int(q.get("question_number", 0)))
+    # One reader per image, so each image is decoded and embedded only once
+    image_readers = {}
     for idx, q in enumerate(questions):
-        progress.progress((idx + 1) / total, text=f"Generating question {idx + 1} of {total}...")
+        if on_question:
+            on_question(idx + 1)
         question_number = q.get("question_number", "N/A")
-        soup = BeautifulSoup(q.get("question", ""), "html.parser")
-        for br in soup.find_all("br"):
-            br.replace_with("\n")
-        question_text = soup.get_text()
+        question_text, urls = parsed[idx]
         answers = q.get("answers", [])
         most_voted = q.get("most_voted") or []
+        if most_voted_only and most_voted:
+            answers = [a for a in answers if a[:1] in most_voted]
 
         # Question number
         c.setFont("Helvetica-Bold", 12)
@@ -97,13 +78,11 @@ def generate_pdf(questions, progress):
         y -= 10
 
         # Question images
-        soup = BeautifulSoup(q.get("question", ""), "html.parser")
-        images = soup.find_all("img")
-        for img in images:
-            src = img.get("src", "")
-            if src.startswith("/"):
-                src = "https://www.examtopics.com" + src
-            img_reader = fetch_image_from_url(src)
+        for src in urls:
+            if src not in image_readers and available_images.get(src):
+                image_data = image_cache.fetch(src)
+                image_readers[src] = ImageReader(BytesIO(image_data)) if image_data else None
+            img_reader = image_readers.get(src)
             if img_reader:
                 img_width = 300
                 img_height = 150  # Or dynamically based on ratio
@@ -113,7 +92,15 @@ def generate_pdf(questions, progress):
                 c.drawImage(img_reader, 40, y - img_height, width=img_width, height=img_height, preserveAspectRatio=True, mask='auto')
                 y -= img_height + 30
             else:
-                raise ValueError(f"Failed to load image for question. Image data was None.")
+                if y < 80:
+                    c.showPage()
+                    y = height - 40
+                c.setFont("Helvetica-Oblique", 9)
+                c.setFillColor(colors.red)
+                c.drawString(40, y, f"[Image could not be loaded: {src}]")
+                c.setFillColor(colors.black)
+                c.setFont("Helvetica", 10)
+                y -= 20
 
         # Answers
         for a in answers:
@@ -153,7 +140,9 @@ def generate_pdf(questions, progress):
             y = height - 40
 
         # --- Discussion Section ---
-        comments = q.get("comments", [])
+        comments = q.get("comments", []) if include_discussion else []
+        if max_comments is not None:
+            comments = comments[:max_comments]
         if comments:
             if y < 100:
                 c.showPage()
@@ -236,6 +225,94 @@ def generate_pdf(questions, progress):
             c.showPage()
             y = height - 40
 
+
+def render_chunk(questions, parsed, available_images, path, options=None):
+    c = canvas.Canvas(path, pagesize=letter, pageCompression=1)
+    render_questions(c, questions, parsed, available_images, options=options)
     c.save()
-    buffer.seek(0)
-    return buffer
\ No newline at end of file
+    return len(questions)
+
+def render_context():
+    # Forking a multithreaded process (the Streamlit server) can copy locks held by other
+    # threads into the children, so the workers start from a clean process instead
+    return multiprocessing.get_context("spawn" if os.name == "nt" else "forkserver")
+
+def render_chunks(questions, parsed, available_images, progress, output, processes=None, options=None):
+    # Lays out ranges of CHUNK_SIZE questions into partial PDFs and merges them in order, so
+    # only one range per process is laid out in memory at a time. The ranges are rendered
+    # one after another, or in a process pool with processes > 1. Every range starts on a new page.
+    total = len(questions)
+    ranges = [(start, min(start + CHUNK_SIZE, total)) for start in range(0, total, CHUNK_SIZE)]
+    with tempfile.TemporaryDirectory() as directory:
+        paths = [os.path.join(directory, f"{i}.pdf") for i in range(len(ranges))]
+        done = 0
+        processes = min(processes or 1, MAX_RENDER_PROCESSES, len(ranges))
+        if processes > 1:
+            with ProcessPoolExecutor(max_workers=processes, mp_context=render_context()) as executor:
+                futures = [
+                    executor.submit(render_chunk, questions[start:end], parsed[start:end], available_images, path, options)
+                    for (start, end), path in zip(ranges, paths)
+                ]
+                for future in as_completed(futures):
+                    done += future.result()
+                    progress.progress(done / total, text=f"Generating question {done} of {total}...")
+        else:
+            for (start, end), path in zip(ranges, paths):
+                done += render_chunk(questions[start:end], parsed[start:end], available_images, path, options)
+                progress.progress(done / total, text=f"Generating question {done} of {total}...")
+        progress.progress(1.0, text="Merging PDF...")
+        pdf_merge.merge(paths, output)
+
+def parse_question_numbers(text):
+    # "1-50, 75" -> {1, 2, ..., 50, 75}
+    numbers = set()
+    for part in text.replace(" ", "").split(","):
+        if not part:
+            continue
+        if "-" in part:
+            first, last = part.split("-", 1)
+            if not first.isdigit() or not last.isdigit():
+                raise ValueError(f"Invalid question range: {part}")
+            if int(last) > MAX_QUESTION_NUMBER:
+                raise ValueError(f"Question numbers go up to {MAX_QUESTION_NUMBER}: {part}")
+            numbers.update(range(int(first), int(last) + 1))
+        elif part.isdigit():
+            if int(part) > MAX_QUESTION_NUMBER:
+                raise ValueError(f"Question numbers go up to {MAX_QUESTION_NUMBER}: {part}")
+            numbers.add(int(part))
+        else:
+            raise ValueError(f"Invalid question number: {part}")
+    return numbers
+
+def generate_pdf(questions, progress, output=None, processes=None, question_numbers=None,
+                 include_discussion=True, max_comments=None, most_voted_only=False, missing_images=None):
+    # output can be a file name or a binary file object; without it the PDF is returned in a BytesIO.
+    # Exams with more than CHUNK_SIZE questions are rendered in chunks, in parallel with processes > 1.
+    # question_numbers limits the export to these questions, include_discussion, max_comments
+    # and most_voted_only leave out the parts of each question that are not needed.
+    # The URLs of images that could not be loaded are appended to the missing_images list.
+    if question_numbers is not None:
+        question_numbers = {str(n) for n in question_numbers}
+        questions = [q for q in questions if str(q.get("question_number")) in question_numbers]
+        if not questions:
+            raise ValueError("No questions match the selected question numbers")
+    options = {"include_discussion": include_discussion, "max_comments": max_comments, "most_voted_only": most_voted_only}
+    total = len(questions)
+    buffer = output if output is not None else BytesIO()
+    questions = sorted(questions, key=lambda q: int(q.get("question_number", 0)))
+    # Download all images up front and concurrently, cached ones are read from disk
+    progress.progress(0, text="Loading images...")
+    parsed = [parse_question_html(q.get("question", "")) for q in questions]
+    available_images = image_cache.prefetch(url for _, urls in parsed for url in urls)
+    if missing_images is not None:
+        missing_images.extend(url for url, available in available_images.items() if not available)
+    if total > CHUNK_SIZE:
+        render_chunks(questions, parsed, available_images, progress, buffer, processes, options)
+    else:
+        c = canvas.Canvas(buffer, pagesize=letter, pageCompression=1)
+        render_questions(c, questions, parsed, available_images,
+                         lambda done: progress.progress(done / total, text=f"Generating question {done} of {total}..."), options)
+        c.save()
+    if output is None:
+        buffer.seek(0)
+    return buffer
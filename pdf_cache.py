@@ -0,0 +1,73 @@
+import hashlib
+import inspect
+import json
+import os
+import threading
+from pdf import generate_pdf
+
+# Rendered PDFs are stored under the hash of the questions and the render options, so
+# exporting an unchanged exam again is a file read.
+CACHE_DIR = os.path.join(".cache", "pdf")
+MAX_CACHED_PDFS = 50
+# Bump when the PDF layout changes, so cached files of the old layout are not served
+RENDER_VERSION = 2
+
+# Defaults of the generate_pdf options; options left at their default are not part of the key,
+# so a PDF built without options is found again with the app's explicit default options
+OPTION_DEFAULTS = {
+    name: parameter.default
+    for name, parameter in inspect.signature(generate_pdf).parameters.items()
+    if parameter.default is not inspect.Parameter.empty
+}
+
+def cache_key(questions, options=None):
+    # options are the keyword arguments of generate_pdf, e.g. question_numbers or max_comments
+    options = {name: value for name, value in (options or {}).items() if OPTION_DEFAULTS.get(name, object()) != value}
+    if options.get("question_numbers") is not None:
+        options["question_numbers"] = sorted(int(n) for n in options["question_numbers"])
+    payload = json.dumps(
+        {"version": RENDER_VERSION, "options": options, "questions": questions},
+        ensure_ascii=False, sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def cache_path(key):
+    return os.path.join(CACHE_DIR, f"{key}.pdf")
+
+def cached_pdf(questions, options=None):
+    path = cache_path(cache_key(questions, options))
+    if os.path.exists(path):
+        os.utime(path)
+        return path
+    return None
+
+def get_pdf(questions, progress, processes=None, options=None):
+    # Returns the path of the PDF for these questions and the URLs of the images that could
+    # not be loaded, rendering the PDF only if it is not cached. A PDF with missing images is
+    # not cached: it is written next to the cache under a name cached_pdf never matches, and
+    # rendered again on the next export.
+    key = cache_key(questions, options)
+    path = cache_path(key)
+    if os.path.exists(path):
+        os.utime(path)
+        progress.progress(1.0, text="Loaded PDF from cache")
+        return path, []
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    missing_images = []
+    try:
+        generate_pdf(questions, progress, tmp_path, processes, missing_images=missing_images, **(options or {}))
+        if missing_images:
+            path = os.path.join(CACHE_DIR, f"{key}.partial.pdf")
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    evict()
+    return path, missing_images
+
+def evict(max_files=MAX_CACHED_PDFS):
+    paths = [os.path.join(CACHE_DIR, name) for name in os.listdir(CACHE_DIR) if name.endswith(".pdf")]
+    paths.sort(key=os.path.getmtime, reverse=True)
+    for path in paths[max_files:]:
+        os.remove(path)
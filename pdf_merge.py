@@ -0,0 +1,145 @@
+import hashlib
+from pypdf import PdfReader
+from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, NameObject, NumberObject, StreamObject
+
+# Concatenates PDFs into one file while writing it, so only the pages of the input that is
+# being copied are in memory, unlike PdfWriter, which keeps every merged page until it writes.
+# Images are written once even if several inputs embed them.
+CATALOG_ID = 1
+PAGES_ID = 2
+# Page attributes that a page can inherit from the page tree it is taken out of
+INHERITED = ("/Resources", "/MediaBox", "/CropBox", "/Rotate")
+
+class StreamingMerger:
+    def __init__(self, output):
+        # output is a binary file object
+        self.output = output
+        self.offsets = {}
+        self.next_id = PAGES_ID + 1
+        self.page_ids = []
+        self.images = {}
+        self.info_id = None
+        output.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def _new_id(self):
+        self.next_id += 1
+        return self.next_id - 1
+
+    def _write_object(self, object_id, obj):
+        self.offsets[object_id] = self.output.tell()
+        self.output.write(f"{object_id} 0 obj\n".encode())
+        obj.write_to_stream(self.output)
+        self.output.write(b"\nendobj\n")
+
+    def _image_digest(self, stream):
+        digest = hashlib.sha256(stream._data)
+        for key in sorted(stream):
+            value = stream[key]
+            if isinstance(value, IndirectObject):
+                value = value.get_object()
+                digest.update(value._data if isinstance(value, StreamObject) else repr(value).encode())
+            else:
+                digest.update(f"{key}={value!r}".encode())
+        return digest.hexdigest()
+
+    def append(self, path):
+        with open(path, "rb") as f:
+            reader = PdfReader(f)
+            ids = {}
+            pending = []
+
+            def copy(obj):
+                # Copy of obj with references renumbered; referenced objects are queued for writing
+                if isinstance(obj, IndirectObject):
+                    key = (obj.idnum, obj.generation)
+                    if key not in ids:
+                        target = obj.get_object()
+                        digest = None
+                        if isinstance(target, StreamObject) and target.get("/Subtype") == "/Image":
+                            digest = self._image_digest(target)
+                        if digest in self.images:
+                            ids[key] = self.images[digest]
+                        else:
+                            ids[key] = self._new_id()
+                            pending.append((ids[key], target))
+                            if digest:
+                                self.images[digest] = ids[key]
+                    return IndirectObject(ids[key], 0, None)
+                if isinstance(obj, StreamObject):
+                    new = obj.__class__()
+                    new._data = obj._data
+                elif isinstance(obj, DictionaryObject):
+                    new = DictionaryObject()
+                elif isinstance(obj, ArrayObject):
+                    return ArrayObject(copy(value) for value in obj)
+                else:
+                    return obj
+                for key, value in obj.items():
+                    new[NameObject(key)] = copy(value)
+                return new
+
+            def flush():
+                while pending:
+                    object_id, obj = pending.pop()
+                    self._write_object(object_id, copy(obj))
+
+            if self.info_id is None and "/Info" in reader.trailer:
+                self.info_id = self._new_id()
+                pending.append((self.info_id, reader.trailer["/Info"].get_object()))
+            for page in reader.pages:
+                page_id = self._new_id()
+                if page.indirect_reference is not None:
+                    ids[(page.indirect_reference.idnum, page.indirect_reference.generation)] = page_id
+                new_page = DictionaryObject()
+                for key, value in page.items():
+                    if key != "/Parent":
+                        new_page[NameObject(key)] = copy(value)
+                for key in INHERITED:
+                    if key not in page:
+                        value = _inherited(page, key)
+                        if value is not None:
+                            new_page[NameObject(key)] = copy(value)
+                new_page[NameObject("/Parent")] = IndirectObject(PAGES_ID, 0, None)
+                self._write_object(page_id, new_page)
+                self.page_ids.append(page_id)
+                flush()
+
+    def close(self):
+        pages = DictionaryObject({
+            NameObject("/Type"): NameObject("/Pages"),
+            NameObject("/Kids"): ArrayObject(IndirectObject(page_id, 0, None) for page_id in self.page_ids),
+            NameObject("/Count"): NumberObject(len(self.page_ids)),
+        })
+        self._write_object(PAGES_ID, pages)
+        catalog = DictionaryObject({
+            NameObject("/Type"): NameObject("/Catalog"),
+            NameObject("/Pages"): IndirectObject(PAGES_ID, 0, None),
+        })
+        self._write_object(CATALOG_ID, catalog)
+
+        xref_offset = self.output.tell()
+        self.output.write(f"xref\n0 {self.next_id}\n0000000000 65535 f \n".encode())
+        for object_id in range(1, self.next_id):
+            self.output.write(f"{self.offsets[object_id]:010d} 00000 n \n".encode())
+        info = f" /Info {self.info_id} 0 R" if self.info_id else ""
+        self.output.write(f"trailer\n<< /Size {self.next_id} /Root {CATALOG_ID} 0 R{info} >>\n".encode())
+        self.output.write(f"startxref\n{xref_offset}\n%%EOF\n".encode())
+
+def _inherited(page, key):
+    node = page.get("/Parent")
+    while node is not None:
+        node = node.get_object()
+        if key in node:
+            return node[key]
+        node = node.get("/Parent")
+    return None
+
+def merge(paths, output):
+    # output can be a file name or a binary file object
+    if isinstance(output, str):
+        with open(output, "wb") as f:
+            return merge(paths, f)
+    merger = StreamingMerger(output)
+    for path in paths:
+        merger.append(path)
+    merger.close()
@@ -0,0 +1,65 @@
+import bisect
+import random
+from answer_stats import AnswerStats
+
+class QuestionStore:
+    # Questions of one exam indexed by number. Backed either by a list of question dicts or,
+    # lazily, by an ExamStore from exam_store, which loads a question only when it is shown.
+    def __init__(self, questions=None, exam_store=None):
+        self.exam_store = exam_store
+        self._answer_stats = None
+        if exam_store is not None:
+            self.by_number = None
+            question_numbers = exam_store.numbers()
+        else:
+            questions = questions or []
+            self.by_number = {}
+            for q in questions:
+                self.by_number.setdefault(str(q.get("question_number")), q)
+            question_numbers = list(self.by_number)
+        self.numbers = sorted({int(n) for n in question_numbers if str(n).isdigit()})
+
+    def __len__(self):
+        return len(self.numbers)
+
+    def __bool__(self):
+        return bool(self.numbers)
+
+    def get(self, question_number):
+        question_number = str(question_number).strip()
+        if self.exam_store is not None:
+            return self.exam_store.get(question_number)
+        return self.by_number.get(question_number)
+
+    def first(self):
+        return self.get(self.numbers[0]) if self.numbers else None
+
+    def next(self, question_number):
+        # First existing question after question_number, skipping gaps in the numbering
+        i = bisect.bisect_right(self.numbers, int(question_number))
+        return self.get(self.numbers[i]) if i < len(self.numbers) else None
+
+    def previous(self, question_number):
+        i = bisect.bisect_left(self.numbers, int(question_number))
+        return self.get(self.numbers[i - 1]) if i > 0 else None
+
+    def random(self):
+        return self.get(random.choice(self.numbers)) if self.numbers else None
+
+    def answer_stats(self):
+        if self.exam_store is not None:
+            return self.exam_store.answer_stats()
+        if self._answer_stats is None:
+            self._answer_stats = AnswerStats.compute(self.by_number.values())
+        return self._answer_stats
+
+    def search(self, query, limit=20):
+        # Full-text search needs the SQLite store, see ExamStore.search
+        if self.exam_store is None:
+            return []
+        return self.exam_store.search(query, limit)
+
+    def all(self):
+        if self.exam_store is not None:
+            return list(self.exam_store.questions())
+        return list(self.by_number.values())
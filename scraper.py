@@ -1,23 +1,31 @@
 from bs4 import BeautifulSoup
 import requests
 import re
-import streamlit as st
 import json
-import time
 import os
+import time
+from functools import partial
+from fetcher import FetchEngine, RETRY_KINDS
+import http_client
+import page_parser
+import page_archive
+import exam_store
+import exam_catalog
 
-HEADERS = {
-            "User-Agent": (
-                "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                "AppleWebKit/537.36 (KHTML, like Gecko) "
-                "Chrome/122.0.0.0 Safari/537.36"
-            ),
-            "Accept-Language": "en-US,en;q=0.9",
-            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-            "Referer": "https://google.com",
-            "Connection": "keep-alive",
-        }
 PREFIX = "https://www.examtopics.com/discussions/"
+EXAMS_URL = "https://www.examtopics.com/exams/"
+CATEGORY_DIR = os.path.join("data", "categories")
+# Published exam files used by the deployed app. Override EXAM_DATA_URL to point at a mirror
+# or a local server. Loads within GITHUB_CACHE_TTL seconds are served from the disk cache.
+GITHUB_DATA_URL = os.environ.get(
+    "EXAM_DATA_URL",
+    "https://raw.githubusercontent.com/17Andri17/ExamTopics-Question-Viewer/refs/heads/main/data",
+)
+GITHUB_CACHE_TTL = 600
+# Failed question pages are tried again up to RETRY_ROUNDS times at the end of a run
+RETRY_ROUNDS = 2
+# Pages parsed per process pool batch by reextract_exam
+REEXTRACT_BATCH = 256
 
 def load_json(json_path):
     if not os.path.exists(json_path):
@@ -29,229 +37,519 @@ def load_json(json_path):
             return {}
         
 def save_json(file, json_path):
-    with open(json_path, 'w', encoding='utf-8') as f:
+    # Write to a temporary file and rename it, so a crash never leaves a half-written cache behind
+    tmp_path = json_path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
         json.dump(file, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, json_path)
 
-def get_exam_category(exam_code):
-    response = requests.get(f"https://www.examtopics.com/search/?query={exam_code}", allow_redirects=True)
-    final_url = response.url
-    if "/exams/" in final_url:
-        parts = final_url.strip("/").split("/")
-        if len(parts) >= 2:
-            return parts[-2]  # category is second-to-last
-        return None
+def checkpoint_path(json_path):
+    return os.path.splitext(json_path)[0] + ".checkpoint.jsonl"
 
-    soup = BeautifulSoup(response.content, "html.parser")
-    exam_list = soup.find_all("ul", class_="exam-list-font")
-    if len(exam_list) < 1:
-        return None
+def append_jsonl(record, jsonl_path):
+    with open(jsonl_path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
 
-    for exam in exam_list:
-        for a in exam.find_all("a", href=True):
-            if a.text.strip().startswith(exam_code):
-                href = a['href']
-                # Split the path and get the second-to-last segment
-                parts = href.strip("/").split("/")
-                if len(parts) >= 2:
-                    return parts[-2]
-    
+def load_jsonl(jsonl_path):
+    records = []
+    if not os.path.exists(jsonl_path):
+        return records
+    with open(jsonl_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                break  # last line was cut off by an interrupted write
+    return records
+
+def question_key(link):
+    # (topic, question number) identifies a question; numbers repeat across topics
+    match = re.search(r"topic-(\d+)-question-(\d+)", link or "")
+    if match:
+        return int(match.group(1)), int(match.group(2))
+    match = re.search(r"question-(\d+)", link or "")
+    if match:
+        return 1, int(match.group(1))
     return None
 
-def get_question_links(exam_code, progress, json_path):
-    progress.progress(0, text=f"Starting link extraction...")
-    category = get_exam_category(exam_code)
+def question_sort_key(question):
+    key = question_key(question.get("link"))
+    if key is None:
+        return (float("inf"), float("inf"))
+    return key
 
-    if not category:
-        raise ValueError(f"Exam code {exam_code} not found.")
+def build_question_index(questions):
+    return {question_key(q.get("link")): q for q in questions}
 
-    url = f"{PREFIX}{category}/"
-    # Get the first page to find number of pages
-    response = requests.get(url, headers=HEADERS)
+def parse_exam_list(content):
+    # (text, href) of the exam links on a search result or vendor page
+    soup = BeautifulSoup(content, "html.parser")
+    exams = []
+    for exam_list in soup.find_all("ul", class_="exam-list-font"):
+        for a in exam_list.find_all("a", href=True):
+            exams.append((a.text.strip(), a["href"]))
+    return exams
+
+def href_category(href):
+    # Exam URLs look like /exams/<category>/<exam>/
+    parts = href.strip("/").split("/")
+    return parts[-2] if len(parts) >= 2 else None
+
+def search_exam_category(exam_code):
+    response = http_client.get(f"https://www.examtopics.com/search/?query={exam_code}", allow_redirects=True)
+    if "/exams/" in response.url:
+        return href_category(response.url)
+    for text, href in parse_exam_list(response.content):
+        if text.startswith(exam_code):
+            category = href_category(href)
+            if category:
+                return category
+    return None
+
+def get_exam_category(exam_code):
+    category = exam_catalog.lookup(exam_code)
+    if category:
+        return category
+    category = search_exam_category(exam_code)
+    if category:
+        exam_catalog.record_exams({exam_code: category})
+    return category
+
+def build_catalog(vendor):
+    # Records all exams listed on the vendor page (e.g. servicenow) in the exam catalog
+    response = http_client.get(f"{EXAMS_URL}{vendor}/", revalidate=True)
+    response.raise_for_status()
+    categories = {}
+    for text, href in parse_exam_list(response.content):
+        # Links read "CAD: Certified Application Developer-ServiceNow"
+        exam_code = text.split(":")[0].strip()
+        category = href_category(href)
+        if exam_code and category:
+            categories[exam_code] = category
+    exam_catalog.record_exams(categories)
+    return categories
+
+def category_index_path(category):
+    return os.path.join(CATEGORY_DIR, f"{category}.json")
+
+def title_exam_code(title_text):
+    # Discussion titles look like "Exam CSA topic 1 question 331 discussion"
+    match = re.search(r"Exam (.+?) topic \d+ question \d+", title_text)
+    return match.group(1).strip() if match else None
+
+def listing_reply_count(title):
+    # The reply count is shown next to the title in the same listing row; None if the
+    # row has no element with "replies" in its class
+    row = title.parent
+    stats = row.find(class_=lambda c: c and "replies" in c) if row else None
+    digits = re.sub(r"\D", "", stats.text) if stats else ""
+    return int(digits) if digits else None
+
+def parse_listing_page(content):
+    # Entries are [title, href, reply count or None]
+    soup = BeautifulSoup(content, "html.parser")
+    entries = []
+    titles = soup.find_all("div", class_="dicussion-title-container")
+    for title in titles:
+        if title.text:
+            title_text = title.text.strip()
+            a_tag = title.find("a")
+            if a_tag and "href" in a_tag.attrs:
+                entries.append([title_text, a_tag["href"], listing_reply_count(title)])
+    return entries
+
+def fetch_listing_page(page_url, session=None):
+    try:
+        response = http_client.get(page_url, session=session, revalidate=True)
+        response.raise_for_status()
+    except Exception:
+        return None
+    return parse_listing_page(response.content)
+
+def listing_engine(rapid_scraping=False):
+    # Listing pages have their own budget, the discussion page budget would slow a crawl down
+    return FetchEngine.from_preset("listing_rapid" if rapid_scraping else "listing")
+
+def fetch_first_page(page_url, session=None):
+    response = http_client.get(page_url, session=session, revalidate=True)
     soup = BeautifulSoup(response.content, "html.parser")
 
-    # Find number of pages
     page_indicator = soup.find("span", class_="discussion-list-page-indicator")
     if not page_indicator:
         raise ValueError("Page indicator not found. Page structure may have changed.")
     strong_tags = page_indicator.find_all("strong")
-    num_pages = int(strong_tags[1].text)
+    return int(strong_tags[1].text), parse_listing_page(response.content)
 
-    links_json = load_json(json_path)
-    if links_json:
-        question_links = links_json.get("links", [])
-        page_num = links_json.get("page_num", 1)
-        status = links_json.get("status", "in progress")
-        if status == "complete":
-            progress.progress(1, text=f"Links extracted from file")
-            return question_links
+def get_first_page(category, engine=None):
+    # Returns the number of listing pages and the entries of the first page, so the
+    # first page is fetched only once
+    if engine is None:
+        engine = listing_engine()
+    return list(engine.map(fetch_first_page, [f"{PREFIX}{category}/"]))[0][1]
+
+def category_entries(category_index):
+    # (title, href) of every listing entry; indexes written before reply counts were
+    # parsed have [title, href] entries
+    for entries in category_index.get("pages", {}).values():
+        for entry in entries:
+            yield entry[0], entry[1]
+    for entry in category_index.get("refreshed", []):
+        yield entry[0], entry[1]
+
+def entry_reply_counts(entries):
+    return {entry[1]: entry[2] for entry in entries if len(entry) > 2 and entry[2] is not None}
+
+def exam_links(category_index, exam_code):
+    links = set()
+    for title_text, href in category_entries(category_index):
+        code = title_exam_code(title_text)
+        if code == exam_code or (code is None and f"Exam {exam_code}" in title_text):
+            links.add(href)
+    return sorted(links, key=lambda link: question_key(link) or (float("inf"), float("inf")))
+
+def crawl_category(category, progress, engine=None, rapid_scraping=False):
+    # Crawls every listing page of a category once and keeps the titles and links of all
+    # exams in it, so the links of every exam in the category come from the same crawl
+    json_path = category_index_path(category)
+    os.makedirs(os.path.dirname(json_path), exist_ok=True)
+    category_index = load_json(json_path) or {"status": "in progress", "num_pages": 0, "pages": {}}
+    if category_index.get("status") == "complete":
+        return category_index
+
+    log_path = checkpoint_path(json_path)
+    for record in load_jsonl(log_path):
+        category_index["pages"][str(record["page"])] = record["entries"]
+
+    if engine is None:
+        engine = listing_engine(rapid_scraping)
+    info = exam_catalog.category_info(category)
+    if info and "1" in category_index["pages"]:
+        # A crawl resumed soon after it stopped keeps the page count it started with
+        num_pages = info["num_pages"]
     else:
-        question_links = []
-        page_num = 1
-        status = "in progress"
-
-    # Loop through all pages
-    for i in range(page_num, num_pages + 1):
-        progress.progress((i) / num_pages, text=f"Extracting question links - page {i} of {num_pages}...")
-        page_url = url + f"{i}/"
-
-        page_response = requests.get(page_url, headers=HEADERS)
-        soup = BeautifulSoup(page_response.content, "html.parser")
-        titles = soup.find_all("div", class_="dicussion-title-container")
-        for title in titles:
-            if title.text:
-                title_text = title.text.strip()
-                if f"Exam {exam_code}" in title_text:
-                    a_tag = title.find("a")
-                    if a_tag and "href" in a_tag.attrs:
-                        question_links.append(a_tag["href"])
-    sorted_links = sorted(question_links, key=lambda link: int(re.search(r'question-(\d+)', link).group(1)))
-    question_links_obj = {"page_num": i, "status": "complete", "links": sorted_links}
-    save_json(question_links_obj, json_path)
-    return sorted_links
+        num_pages, first_entries = get_first_page(category, engine)
+        category_index["pages"]["1"] = first_entries
+        exam_catalog.record_category(category, num_pages)
+    category_index["num_pages"] = num_pages
+    save_json(category_index, json_path)
+    if os.path.exists(log_path):
+        os.remove(log_path)
 
-def scrape_page(link):
-    question_object = {}
+    url = f"{PREFIX}{category}/"
+    page_urls = {url + f"{i}/": i for i in range(1, num_pages + 1) if str(i) not in category_index["pages"]}
+    done = num_pages - len(page_urls)
+    for page_url, entries in engine.map(fetch_listing_page, list(page_urls)):
+        done += 1
+        progress.progress(done / num_pages, text=f"Extracting question links - page {done} of {num_pages}...")
+        if entries is None:
+            continue
+        page_num = page_urls[page_url]
+        category_index["pages"][str(page_num)] = entries
+        append_jsonl({"page": page_num, "entries": entries}, log_path)
 
-    try:
-        response = requests.get(link, headers=HEADERS)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, "html.parser")
-    except Exception as e:
-        return {
-            "question": "",
-            "answers": [],
-            "comments": [],
-            "most_voted": None,
-            "link": link,
-            "question_number": "unknown",
-            "error": f"Request or parsing failed: {e}"
-        }
-
-    question_number_match = re.search(r"question-(\d+)", link)
-    question_number = question_number_match.group(1) if question_number_match else "unknown"
-
-    # Extract question
-    question = ""
-    try:
-        question_div = soup.find("div", class_="question-body")
-        question_content = question_div.find("p", class_="card-text") if question_div else None
-        if question_content:
-            question = question_content.decode_contents().strip()
-    except Exception:
-        pass
+    if len(category_index["pages"]) >= num_pages:
+        category_index["status"] = "complete"
+        # The crawl lists every exam of the category, so they all go into the catalog
+        codes = {title_exam_code(title_text) for title_text, _ in category_entries(category_index)}
+        reply_counts = category_index.setdefault("reply_counts", {})
+        for entries in category_index["pages"].values():
+            reply_counts.update(entry_reply_counts(entries))
+        exam_catalog.record_exams({code: category for code in codes if code})
+        exam_catalog.record_category(category, num_pages)
+    save_json(category_index, json_path)
+    if os.path.exists(log_path):
+        os.remove(log_path)
+    return category_index
 
-    # Extract most voted answers
-    most_voted = None
-    try:
-        voted_answers = soup.find("div", class_="voted-answers-tally")
-        if voted_answers:
-            script_content = voted_answers.find("script")
-            if script_content and script_content.string:
-                voted_json = json.loads(script_content.string)
-                most_voted_object = next((item for item in voted_json if item.get('is_most_voted')), None)
-                if most_voted_object:
-                    most_voted = most_voted_object.get("voted_answers", None)
-    except Exception:
-        pass
+def refresh_category(category, progress, engine=None, rapid_scraping=False):
+    # Walks the listing from the newest page, which lists the discussions with the latest
+    # activity first, until a page has no unknown link and no discussion whose reply count
+    # grew. Returns the category index with the new entries and the links that are new or
+    # got new replies.
+    json_path = category_index_path(category)
+    category_index = load_json(json_path)
+    if category_index.get("status") != "complete":
+        return crawl_category(category, progress, engine, rapid_scraping), set()
+    if exam_catalog.category_info(category):
+        # Read moments ago, e.g. for another exam of the category, whose changes are still pending
+        return category_index, set(category_index.get("changed", []))
 
-    # Extract answer options
-    answers = []
-    try:
-        if question_div:
-            answers_div = question_div.find("div", class_="question-choices-container")
-            if answers_div:
-                answer_options = answers_div.find_all("li")
-                if answer_options:
-                    answers = [re.sub(r'\s+', ' ', answer_option.text).strip() for answer_option in answer_options]
-    except Exception:
-        pass
+    if engine is None:
+        engine = listing_engine(rapid_scraping)
+    known_links = {href for _, href in category_entries(category_index)}
+    reply_counts = category_index.setdefault("reply_counts", {})
+    changed_links = set()
+    refreshed = category_index.setdefault("refreshed", [])
+    num_pages = category_index["num_pages"]
+    url = f"{PREFIX}{category}/"
+    for i in range(1, num_pages + 1):
+        progress.progress(i / num_pages, text=f"Checking for new questions - page {i}...")
+        _, entries = list(engine.map(fetch_listing_page, [url + f"{i}/"]))[0]
+        if entries is None:
+            raise ValueError("Some discussion pages could not be loaded. Your IP may be rate-limited. Try again later.")
+        new_entries = [entry for entry in entries if entry[1] not in known_links]
+        grown = [
+            entry[1] for entry in entries
+            if entry[1] in known_links and entry[2] is not None and entry[2] > reply_counts.get(entry[1], entry[2])
+        ]
+        changed_links.update(entry[1] for entry in new_entries)
+        changed_links.update(grown)
+        # Without a reply count, or without an earlier one to compare with, a seen link is
+        # checked again, but does not keep the walk going
+        changed_links.update(entry[1] for entry in entries if entry[2] is None or entry[1] not in reply_counts)
+        reply_counts.update(entry_reply_counts(entries))
+        refreshed.extend(new_entries)
+        known_links.update(entry[1] for entry in new_entries)
+        if not new_entries and not grown:
+            break
+    # Changes of other exams in the category stay pending until those exams are refreshed
+    changed_links.update(category_index.get("changed", []))
+    category_index["changed"] = sorted(changed_links)
+    category_index["refreshed_at"] = time.time()
+    save_json(category_index, json_path)
+    exam_catalog.record_category(category, num_pages)
+    return category_index, changed_links
 
-    # Extract comments and replies
-    comments = []
-    try:
-        discussion_div = soup.find("div", class_="discussion-container")
-        comment_divs = discussion_div.find_all("div", class_="comment-container", recursive=False) if discussion_div else []
-        for comment_div in comment_divs:
-            comment = {}
-            try:
-                comment_content_div = comment_div.find("div", class_="comment-content")
-                comment_content = comment_content_div.text.strip() if comment_content_div else ""
-            except Exception:
-                comment_content = ""
+def refresh_question_links(exam_code, progress, json_path, engine=None, rapid_scraping=False):
+    progress.progress(0, text=f"Checking for new questions...")
+    category = get_exam_category(exam_code)
+    if not category:
+        raise ValueError(f"Exam code {exam_code} not found.")
 
-            try:
-                comment_selected_answer = comment_div.find("div", class_="comment-selected-answers")
-                selected_answer = comment_selected_answer.find("span").text.strip() if comment_selected_answer else ""
-            except Exception:
-                selected_answer = ""
+    category_index, changed_links = refresh_category(category, progress, engine, rapid_scraping)
+    if category_index["status"] != "complete":
+        raise ValueError("Some discussion pages could not be loaded. Your IP may be rate-limited. Try again later, already loaded pages are kept.")
+    sorted_links = exam_links(category_index, exam_code)
+    question_links_obj = {"page_num": category_index["num_pages"], "status": "complete", "links": sorted_links}
+    save_json(question_links_obj, json_path)
+    recheck_links = [link for link in sorted_links if link in changed_links]
+    category_index["changed"] = sorted(changed_links - set(recheck_links))
+    save_json(category_index, category_index_path(category))
+    return sorted_links, recheck_links
 
-            replies = []
-            try:
-                comment_replies_div = comment_div.find("div", class_="comment-replies")
-                if comment_replies_div:
-                    reply_divs = comment_replies_div.find_all("div", class_="comment-container")
-                    for reply in reply_divs:
-                        try:
-                            reply_content = reply.find("div", class_="comment-content").text.strip()
-                        except Exception:
-                            reply_content = ""
-                        replies.append(reply_content)
-            except Exception:
-                pass
-
-            comment["content"] = comment_content
-            comment["selected_answer"] = selected_answer
-            comment["replies"] = replies
-
-            comments.append(comment)
-    except Exception:
-        pass
+def get_question_links(exam_code, progress, json_path, engine=None, rapid_scraping=False):
+    progress.progress(0, text=f"Starting link extraction...")
+    links_json = load_json(json_path)
+    if links_json.get("status") == "complete":
+        progress.progress(1, text=f"Links extracted from file")
+        return links_json.get("links", [])
 
-    question_object["question"] = question
-    question_object["answers"] = answers
-    question_object["comments"] = comments
-    question_object["question_number"] = question_number
-    question_object["link"] = link
-    question_object["most_voted"] = most_voted
-    question_object["error"] = None
+    category = get_exam_category(exam_code)
+    if not category:
+        raise ValueError(f"Exam code {exam_code} not found.")
+
+    category_index = crawl_category(category, progress, engine, rapid_scraping)
+    if category_index["status"] != "complete":
+        raise ValueError("Some discussion pages could not be loaded. Your IP may be rate-limited. Try again later, already loaded pages are kept.")
+    sorted_links = exam_links(category_index, exam_code)
+    question_links_obj = {"page_num": category_index["num_pages"], "status": "complete", "links": sorted_links}
+    save_json(question_links_obj, json_path)
+    return sorted_links
 
+def classify_failure(error):
+    # Failure kind of a request error, see fetcher.AdaptiveController
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        status = error.response.status_code
+        if status == 429:
+            return "rate_limited"
+        if status == 403:
+            return "blocked"
+        if status in (404, 410):
+            return "not_found"
+        if status >= 500:
+            return "server"
+        return "http"
+    if isinstance(error, requests.Timeout):
+        return "timeout"
+    if isinstance(error, requests.ConnectionError):
+        return "connection"
+    return "parse"
+
+def retry_after(response):
+    value = response.headers.get("Retry-After", "")
+    return float(value) if value.isdigit() else None
+
+def failed_page(link, error, kind, wait=None):
+    return {
+        "question": "",
+        "answers": [],
+        "comments": [],
+        "most_voted": None,
+        "link": link,
+        "question_number": "unknown",
+        "error": error,
+        "error_kind": kind,
+        "retry_after": wait,
+    }
+
+def scrape_page(link, session=None, archive=True):
+    # archive is False to keep the page out of the page archive, or the archive directory
+    response = None
+    try:
+        response = http_client.get(link, session=session, revalidate=True)
+        response.raise_for_status()
+        question_object = page_parser.parse_page(response.content, link)
+    except Exception as e:
+        wait = retry_after(response) if response is not None else None
+        return failed_page(link, f"Request or parsing failed: {e}", classify_failure(e), wait)
+    if not question_object["question"] and not question_object["answers"]:
+        # A captcha or an empty page instead of the discussion, which must not be
+        # served from the HTTP cache on the next try
+        http_client.discard_cached(link)
+        return failed_page(link, "The page has no question, probably a captcha page", "captcha")
+    if archive and not response.from_cache:
+        page_archive.append(link, response.content, None if archive is True else archive)
     return question_object
 
-        
-def scrape_questions(question_links, json_path, progress, rapid_scraping=False):
+def page_feedback(question_object):
+    return question_object.get("error_kind"), question_object.get("retry_after")
+
+def scrape_questions(question_links, json_path, progress, rapid_scraping=False, engine=None, recheck_links=None, archive=True):
+    # Links in recheck_links are fetched again even if already scraped; with the
+    # conditional requests of http_client unchanged discussions cost a 304 only.
+    # Links that fail are tried again at the end of the run and saved as failed_links,
+    # the next run starts with them.
     questions_obj = load_json(json_path)
     if questions_obj:
         questions = questions_obj.get("questions", [])
+        failed_links = questions_obj.get("failed_links", [])
     else:
         questions = []
+        failed_links = []
+    question_index = build_question_index(questions)
+    # Recover pages saved by an interrupted run and compact them into the JSON file,
+    # so this run starts with an empty checkpoint log
+    log_path = checkpoint_path(json_path)
+    recovered = load_jsonl(log_path)
+    if recovered:
+        question_index.update(build_question_index(recovered))
+        questions = sorted(question_index.values(), key=question_sort_key)
+        save_json({"status": "in progress", "error": "", "questions": questions, "failed_links": failed_links}, json_path)
+    if os.path.exists(log_path):
+        os.remove(log_path)
+    if engine is None:
+        engine = FetchEngine.from_preset("rapid" if rapid_scraping else "default", adaptive=True)
+    # Without an adaptive controller the run stops at the first failure
+    stop_on = None if engine.controller else (lambda question_object: question_object["error"])
     prefix = "https://www.examtopics.com"
     questions_num = len(question_links)
-    error_string = ""
-    for i, link in enumerate(question_links):
-        question_number_match = re.search(r"question-(\d+)", link)
-        question_number = question_number_match.group(1) if question_number_match else "unknown"
-        if question_number in [q["question_number"] for q in questions]:
-            progress.progress((i+1)/(questions_num), text=f"{i+1}/{questions_num} - Skipping {prefix+link}")
+    last_error = ""
+    done = 0
+    to_scrape = []
+    recheck_links = set(recheck_links or [])
+    previously_failed = set(failed_links) & set(question_links)
+    ordered_links = [link for link in failed_links if link in previously_failed]
+    ordered_links += [link for link in question_links if link not in previously_failed]
+    for link in ordered_links:
+        if question_key(prefix+link) in question_index and link not in recheck_links and link not in previously_failed:
+            done += 1
+            progress.progress(done/questions_num, text=f"{done}/{questions_num} - Skipping {prefix+link}")
             continue
-        progress.progress((i+1)/(questions_num), text=f"{i+1}/{questions_num} - Scraping {prefix+link}")
-        question_object = scrape_page(prefix+link)
-        if question_object["error"]:
-            error_string = (f"Error: {question_object['error']}")
+        to_scrape.append(prefix+link)
+    scrape_links = [url[len(prefix):] for url in to_scrape]
+    scraped = set()
+    for round_num in range(RETRY_ROUNDS + 1):
+        retry = []
+        last_round = round_num == RETRY_ROUNDS
+        for url, question_object in engine.map(partial(scrape_page, archive=archive), to_scrape, stop_on=stop_on, feedback=page_feedback):
+            if question_object["error"]:
+                last_error = question_object["error"]
+                if not last_round and question_object.get("error_kind") in RETRY_KINDS:
+                    retry.append(url)
+                    progress.progress(done/questions_num, text=f"{done}/{questions_num} - Failed {url}, trying again later")
+                    continue
+                done += 1
+                progress.progress(done/questions_num, text=f"{done}/{questions_num} - Failed {url}")
+                continue
+            done += 1
+            scraped.add(url)
+            progress.progress(done/questions_num, text=f"{done}/{questions_num} - Scraped {url}")
+            if question_index.get(question_key(url)) == question_object:
+                continue
+            question_index[question_key(url)] = question_object
+            append_jsonl(question_object, log_path)
+        to_scrape = retry
+        if not to_scrape or stop_on or engine.controller.gave_up:
             break
-        questions.append(question_object)
-        if not rapid_scraping:
-            time.sleep(5)
-    questions.sort(key=lambda x: x["question_number"])
+    failed_links = [link for link in scrape_links if prefix+link not in scraped]
+    error_string = f"Error: {len(failed_links)} questions could not be loaded. Last error: {last_error}" if failed_links else ""
+    questions = sorted(question_index.values(), key=question_sort_key)
     status = "complete" if len(questions) == questions_num else "in progress"
-    questions_obj = {"status": status, "error": error_string, "questions": questions}
+    questions_obj = {"status": status, "error": error_string, "questions": questions, "failed_links": failed_links}
     save_json(questions_obj, json_path)
+    exam_store.write_exam(questions_obj, exam_store.store_path(json_path))
+    if os.path.exists(log_path):
+        os.remove(log_path)
     return questions_obj
+
+def reextract_exam(exam_code, progress, processes=None, backend=None, data_dir="data", archive_dir=None):
+    # Rebuilds data/<exam>.json from the page archive without any request. Questions whose
+    # page is not archived are kept from the current file. Returns the number of pages parsed.
+    # Exams without a file or without archived pages are left alone.
+    questions_path = os.path.join(data_dir, f"{exam_code}.json")
+    if not os.path.exists(questions_path):
+        return 0
+    links = load_json(os.path.join(data_dir, f"{exam_code}_links.json")).get("links", [])
+    prefix = "https://www.examtopics.com"
+    index = page_archive.load_index(archive_dir)
+    urls = [prefix+link for link in links if prefix+link in index]
+    if not urls:
+        return 0
+    questions_obj = load_json(questions_path)
+    question_index = build_question_index(questions_obj.get("questions", []))
+    for start in range(0, len(urls), REEXTRACT_BATCH):
+        batch = urls[start:start + REEXTRACT_BATCH]
+        pages = [(page_archive.read(index[url], archive_dir), url) for url in batch]
+        for question_object in page_parser.parse_pages(pages, processes, backend):
+            question_index[question_key(question_object["link"])] = question_object
+        done = start + len(batch)
+        progress.progress(done / len(urls), text=f"{done}/{len(urls)} - Extracted from the archive")
+    questions = sorted(question_index.values(), key=question_sort_key)
+    failed_links = [link for link in links if question_key(prefix+link) not in question_index]
+    status = "complete" if len(questions) == len(links) else "in progress"
+    error_string = f"Error: {len(failed_links)} questions could not be loaded." if failed_links else ""
+    questions_obj = {"status": status, "error": error_string, "questions": questions, "failed_links": failed_links}
+    save_json(questions_obj, questions_path)
+    exam_store.write_exam(questions_obj, exam_store.store_path(questions_path))
+    return len(urls)
+
+def scrape_exam(exam_code, progress, rapid_scraping=False, refresh=False, data_dir="data"):
+    # Scrapes or refreshes data/<exam>.json and returns an error message, "" on success
+    questions_path = os.path.join(data_dir, f"{exam_code}.json")
+    links_path = os.path.join(data_dir, f"{exam_code}_links.json")
+    if refresh:
+        try:
+            links, recheck_links = refresh_question_links(exam_code, progress, links_path, rapid_scraping=rapid_scraping)
+        except Exception as e:
+            return str(e)
+        questions_obj = scrape_questions(links, questions_path, progress, rapid_scraping, recheck_links=recheck_links)
+        if questions_obj.get("error","") != "":
+            return f"Error occurred while refreshing questions. You can still see {len(questions_obj['questions'])} questions. Try again later."
+        return ""
+    if load_json(questions_path).get("status") == "complete":
+        progress.progress(100, text=f"Extracted questions from file")
+        return ""
+    try:
+        links = get_question_links(exam_code, progress, links_path, rapid_scraping=rapid_scraping)
+    except Exception as e:
+        return str(e)
+
+    if len(links) == 0:
+        return "No questions found. Please check the exam code and try again."
+    questions_obj = scrape_questions(links, questions_path, progress, rapid_scraping)
+    if questions_obj.get("error","") != "":
+        return f"Error occurred while scraping questions. Your connection may be slow or the website may have limited your rate. You can still see {len(questions_obj['questions'])} questions. Try again later by refreshing the page."
+    return ""
     
 
-def load_json_from_github(exam_code):
-    url = f"https://raw.githubusercontent.com/17Andri17/ExamTopics-Question-Viewer/refs/heads/main/data/{exam_code}.json"
+def load_json_from_github(exam_code, base_url=None, ttl=GITHUB_CACHE_TTL):
+    url = f"{(base_url or GITHUB_DATA_URL).rstrip('/')}/{exam_code}.json"
     try:
-        response = requests.get(url)
+        response = http_client.get(url, revalidate=True, ttl=ttl, stale_if_error=True)
         response.raise_for_status()
         questions_obj = json.loads(response.text)
         questions = questions_obj.get("questions", [])
@@ -0,0 +1,98 @@
+import threading
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+class TextMeasurer:
+    # Measures text from cached per-character glyph widths. ReportLab computes the width of a
+    # string as (sum of glyph widths in 1/1000 em) * 0.001 * size, so summing the cached
+    # per-character units gives exactly the same widths as calling stringWidth on the string.
+    def __init__(self):
+        self.char_units = {}
+        self.lock = threading.Lock()
+
+    def units(self, text, font):
+        widths = self.char_units.get(font)
+        if widths is None:
+            with self.lock:
+                widths = self.char_units.setdefault(font, {})
+        total = 0
+        for char in text:
+            width = widths.get(char)
+            if width is None:
+                width = stringWidth(char, font, 1000)
+                # Undo the float scaling for the usual integer glyph widths, so sums stay exact
+                if abs(width - round(width)) < 1e-6:
+                    width = round(width)
+                widths[char] = width
+            total += width
+        return total
+
+    def prefix_units(self, text, font):
+        prefix = [0]
+        for char in text:
+            prefix.append(prefix[-1] + self.units(char, font))
+        return prefix
+
+    def width(self, text, font, font_size):
+        return self.units(text, font) * 0.001 * font_size
+
+_measurer = TextMeasurer()
+
+def _fits(units, max_width, font_size):
+    return units * 0.001 * font_size <= max_width
+
+def _split_long_word(word, max_width, font, font_size, measurer):
+    # Splits a word wider than the line into chunks that fit, finding each break with a
+    # binary search over the prefix sums of the character widths. Returns the full chunks
+    # and the last, still open chunk.
+    prefix = measurer.prefix_units(word, font)
+    lines = []
+    if not _fits(prefix[1], max_width, font_size):
+        lines.append("")  # a too-wide first character always produced an empty line
+    start = 0
+    while True:
+        low, high = start + 1, len(word)
+        while low < high:
+            mid = (low + high + 1) // 2
+            if _fits(prefix[mid] - prefix[start], max_width, font_size):
+                low = mid
+            else:
+                high = mid - 1
+        if low == len(word):
+            return lines, word[start:], prefix[-1] - prefix[start]
+        lines.append(word[start:low])
+        start = low
+
+def wrap_text(text, max_width, font, font_size, new_line=False, measurer=None):
+    measurer = measurer or _measurer
+    space_units = measurer.units(" ", font)
+
+    lines = []
+    for paragraph in text.split('\n'):
+        words = paragraph.split()
+        current_line = ""
+        current_units = 0
+
+        for word in words:
+            word_units = measurer.units(word, font)
+            test_units = current_units + space_units + word_units if current_line else word_units
+            if _fits(test_units, max_width, font_size):
+                current_line = f"{current_line} {word}" if current_line else word
+                current_units = test_units
+            else:
+                # If the word itself is too long, split it
+                if not _fits(word_units, max_width, font_size):
+                    if current_line:
+                        lines.append(current_line)
+                    chunks, current_line, current_units = _split_long_word(word, max_width, font, font_size, measurer)
+                    lines.extend(chunks)
+                else:
+                    lines.append(current_line)
+                    current_line = word
+                    current_units = word_units
+
+        if current_line:
+            lines.append(current_line)
+        if new_line:
+            lines.append("")
+
+    return lines
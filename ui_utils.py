@@ -1,5 +1,34 @@
 import streamlit as st
 from bs4 import BeautifulSoup
+from collections import OrderedDict
+from functools import lru_cache
+import hashlib
+import json
+import math
+import threading
+
+RENDER_CACHE_SIZE = 256
+
+class RenderCache:
+    # Small thread-safe LRU for rendered HTML, shared by all sessions of the app
+    def __init__(self, maxsize=RENDER_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get_or_render(self, key, render):
+        with self.lock:
+            if key in self.items:
+                self.items.move_to_end(key)
+                return self.items[key]
+        value = render()
+        with self.lock:
+            self.items[key] = value
+            if len(self.items) > self.maxsize:
+                self.items.popitem(last=False)
+        return value
+
+_discussion_cache = RenderCache()
 
 def fix_image_paths(html_text, prefix):
     soup = BeautifulSoup(html_text, "html.parser")
@@ -32,8 +61,13 @@ def render_question_header(question):
         unsafe_allow_html=True
     )
 
+@lru_cache(maxsize=RENDER_CACHE_SIZE)
+def fixed_question_html(html_text, prefix):
+    # Keyed by the question HTML itself, so reruns of the same question skip the parse
+    return fix_image_paths(html_text, prefix)
+
 def render_question_body(question, image_prefix):
-    question_html = fix_image_paths(question["question"], image_prefix)
+    question_html = fixed_question_html(question["question"], image_prefix)
     st.markdown(f"**{question_html}**", unsafe_allow_html=True)
 
 def render_answers(question, highlight):
@@ -56,12 +90,7 @@ def render_highlight_toggle(question):
             else:
                 st.warning("No most voted answer info available.")
 
-def render_discussion(comments):
-    if not comments:
-        st.info("No discussion available.")
-        return
-
-    st.markdown("""
+DISCUSSION_CSS = """
     <style>
         .comment-box {
             border: 1px solid #ddd;
@@ -91,8 +120,11 @@ def render_discussion(comments):
             font-size: 0.9em;
         }
     </style>
-    """, unsafe_allow_html=True)
+    """
 
+def discussion_html(comments):
+    # One HTML block per st.markdown call: the CSS, then every comment
+    html_parts = [DISCUSSION_CSS]
     for idx, comment in enumerate(comments, 1):
         header = f"💬 Comment {idx}"
         if comment.get("selected_answer"):
@@ -108,4 +140,60 @@ def render_discussion(comments):
             <div>{comment['content']}</div>
             {replies_html}</div>
         """
-        st.markdown(comment_html, unsafe_allow_html=True)
+        html_parts.append(comment_html)
+    return tuple(html_parts)
+
+def comments_digest(comments):
+    # Changes with any new reply or edited comment, unlike the number of comments
+    return hashlib.sha1(json.dumps(comments, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+def render_discussion(comments, cache_key=None):
+    # cache_key identifies the discussion (e.g. exam code and question link) and is combined
+    # with a digest of the comments; without it the HTML is built on every call
+    if not comments:
+        st.info("No discussion available.")
+        return
+
+    if cache_key is None:
+        html_parts = discussion_html(comments)
+    else:
+        html_parts = _discussion_cache.get_or_render((cache_key, comments_digest(comments)), lambda: discussion_html(comments))
+    for html in html_parts:
+        st.markdown(html, unsafe_allow_html=True)
+
+CONSENSUS_FILTERS = {
+    "all": "All questions",
+    "disputed": "Disputed (community pick differs from most voted)",
+    "low_agreement": "Low agreement with most voted",
+}
+CONSENSUS_SORTS = {
+    "number": "Question number",
+    "agreement": "Lowest agreement",
+    "comments": "Largest discussion",
+    "votes": "Most votes",
+}
+
+def format_picks(distribution):
+    return ", ".join(f"{answer} ({count})" for answer, count in distribution)
+
+def consensus_table(stats, rows):
+    table = {"Question": [], "Most voted": [], "Community picks": [], "Agreement": [], "Votes": [], "Comments": []}
+    for i in rows:
+        row = stats.row(i)
+        table["Question"].append(row["question_number"])
+        table["Most voted"].append(row["most_voted"] or "")
+        table["Community picks"].append(format_picks(stats.distribution(i)))
+        table["Agreement"].append(None if math.isnan(row["agreement"]) else round(row["agreement"] * 100))
+        table["Votes"].append(row["votes"])
+        table["Comments"].append(row["comments"])
+    return table
+
+def render_consensus_summary(stats, question_number):
+    i = stats.find(question_number)
+    if i is None or not stats.row(i)["votes"]:
+        return
+    row = stats.row(i)
+    summary = f"Community picks: {format_picks(stats.distribution(i))}"
+    if not math.isnan(row["agreement"]):
+        summary += f" · {row['agreement']:.0%} agree with the most voted answer"
+    st.caption(summary)